@@ -1,6 +1,5 @@
 import streamlit as st
 from multiapp import MultiApp
-from apps import home, data, model, data_cleaner, inference, data_visualisation # import your app modules here
 
 app = MultiApp()
 
@@ -8,11 +7,12 @@ st.markdown("""
 # Roche Hackathon 2023 
 """)
 
-# Add all your application here
-app.add_app("Home", home.app)
-app.add_app("Data Cleaner", data_cleaner.app) 
-app.add_app("Visualize", data_visualisation.app)
-app.add_app("Model", model.app)
-app.add_app("inference", inference.app)
+# Add all your application here. The pages are given by module name and only
+# imported when they are selected (see benchmarks/bench_startup.py)
+app.add_app("Home", "apps.home")
+app.add_app("Data Cleaner", "apps.data_cleaner")
+app.add_app("Visualize", "apps.data_visualisation")
+app.add_app("Model", "apps.model")
+app.add_app("inference", "apps.inference")
 # The main app
 app.run()
@@ -1,7 +1,9 @@
 import numpy as np
 import pandas as pd
 import streamlit as st
-from apps.helpers import clean_data
+from apps.diagnostics import stage
+from apps.helpers import clean_data_chunked
+from apps.profiling import class_balance, load_profile, profile_file, profile_table
 def app():
 # Web App Title
     st.markdown('''
@@ -16,12 +18,11 @@ def app():
 
 # Pandas Profiling Report
     if uploaded_file is not None:
-        def load_csv():
-            csv = pd.read_csv(uploaded_file)
-            return csv
-        df = load_csv()
+        # only a preview is loaded, the cleaning itself streams through the file
+        uploaded_file.seek(0)
+        df = pd.read_csv(uploaded_file, nrows=1000)
         st.header('**Input DataFrame**')
-        st.write(df.info())
+        st.write(df.head(10))
 
         columns = df.columns.tolist()
 
@@ -31,15 +32,42 @@ def app():
         st.write("2. Please select which column you want the model to predict")
         predict_column = st.selectbox("Target", columns)
 
+        # only on request: one pass over the whole upload, kept for the session so reruns
+        # and another target do not scan it again (the class balance of every column is
+        # in the value counts of the profile)
+        if st.checkbox("profile the upload"):
+            profile_key = (uploaded_file.name, uploaded_file.size)
+            if st.session_state.get("upload_profile_key") != profile_key:
+                uploaded_file.seek(0)
+                with stage("profile"):
+                    st.session_state["upload_profile"] = profile_file(uploaded_file, target=None)
+                st.session_state["upload_profile_key"] = profile_key
+            upload_profile = st.session_state["upload_profile"]
+            with st.expander(f"profile of the upload ({upload_profile['rows']} rows)", expanded=True):
+                classes = class_balance(upload_profile, predict_column)
+                if classes is None:
+                    st.write(f"{predict_column} has too many distinct values for a class balance")
+                else:
+                    st.write("target classes: " + ", ".join(f"{cls}: {n}" for cls, n in classes.items()))
+                st.dataframe(profile_table(upload_profile))
+
+        mappings = {"keep the target as it is": None, "sepsis_group to sepsis yes/no": "binary", "one class per group": "multiclass"}
+        label_mapping = st.selectbox("3. How should the target be mapped to classes?", list(mappings))
+
         name = st.text_input("name of file to be saved")
 
         if st.button('Press to clean data'):
             if name == "":
                 name = "neonatal"
-                df = clean_data(df, "neonatal", selected_columns, predict_column)
-            else:
-                df = clean_data(df, name, selected_columns, predict_column)
+            uploaded_file.seek(0)
+            with stage("clean"):
+                stats = clean_data_chunked(uploaded_file, name, selected_columns, predict_column, label_mapping=mappings[label_mapping])
             st.write("data has been saved")
+            st.write(f"{stats['rows_in']} rows in, {stats['rows_out']} rows out in {stats['seconds']:.1f}s ({stats['rows_per_s']:.0f} rows/s)"
+                     + (", reused the cached result" if stats['cached'] else ""))
+            # the profile sidecar is written right away, the other pages only read it
+            profile = load_profile(f"data/{name}.csv")
+            st.write("class balance of the cleaned data: " + ", ".join(f"{cls}: {n}" for cls, n in profile["classes"].items()))
     else:
         st.info('Awaiting for CSV file to be uploaded.')
 
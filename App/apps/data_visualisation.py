@@ -1,42 +1,66 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
 import os
-def countplot(df):
+from apps.datasets import dtype_report, list_datasets, load_dataset
+from apps.diagnostics import stage
+from apps.profiling import load_profile, profile_table
+from apps.plot_summaries import dataset_summary, draw_box, draw_counts, draw_hist, draw_violin
+# the plots are drawn from summaries (quantiles, histograms, KDE grids) computed once
+# per dataset, so redrawing does not depend on the number of rows
+def countplot(summary):
     if st.button("press to see the count plot"):
-        fig = plt.figure(figsize=(10,4))
+        fig, ax = plt.subplots(figsize=(10,4))
         st.write(" ### how balanced is the dataset ")
-        sns.countplot(data=df, x="target")
-        st.pyplot(fig)
-def boxplot(df):
-    name = st.selectbox("select a feature", df.columns.to_list())
+        with stage("plot"):
+            draw_counts(ax, summary)
+            st.pyplot(fig)
+def boxplot(summary):
+    name = st.selectbox("select a feature", list(summary["features"]))
     if st.button("press to see boxplot for any feature in the dataset"):
-        fig = plt.figure(figsize=(6, 6))
+        fig, ax = plt.subplots(figsize=(6, 6))
         st.write(" ### compare the box plots for sepsis and non sepsis")
-        sns.boxplot(data=df, y=name, x="target")
-        st.pyplot(fig)
-def violin(df):
-    name = st.selectbox("select a feature", df.columns.to_list())
+        with stage("plot"):
+            draw_box(ax, summary, name)
+            st.pyplot(fig)
+def violin(summary):
+    name = st.selectbox("select a feature", list(summary["features"]))
     if st.button("press to see violin plot for any feature in the dataset"):
-        fig = plt.figure(figsize=(6, 6))
+        fig, ax = plt.subplots(figsize=(6, 6))
         st.write(" ### compare the box plots for sepsis and non sepsis")
-        sns.violinplot(data=df, y=name, x="target")
-        st.pyplot(fig)
+        with stage("plot"):
+            draw_violin(ax, summary, name)
+            st.pyplot(fig)
+def histogram(summary):
+    name = st.selectbox("select a feature", list(summary["features"]))
+    if st.button("press to see the histogram for any feature in the dataset"):
+        fig, ax = plt.subplots(figsize=(6, 6))
+        st.write(" ### compare the distributions for sepsis and non sepsis")
+        with stage("plot"):
+            draw_hist(ax, summary, name)
+            st.pyplot(fig)
 def app():
     st.title("visualize Your Cleaned Dataset")
 
     # csv = st.sidebar.file_uploader("Please select the cleaned data")
     st.sidebar.write("1. Choose the cleaned dataset")
-    data_path = st.sidebar.selectbox("select the training data", os.listdir("data/"))
+    data_path = st.sidebar.selectbox("select the training data", list_datasets())
 
-    df = pd.read_csv("data/" + data_path)
+    with stage("data load"):
+        summary = dataset_summary("data/" + data_path)
+        profile = load_profile("data/" + data_path)
+    st.sidebar.caption(f"{profile['rows']} rows, classes: " + ", ".join(f"{cls}: {n}" for cls, n in profile["classes"].items()))
+    with st.expander("dataset profile (missing values, ranges, correlation with the target)"):
+        st.dataframe(profile_table(profile))
     if st.button("press to see some of the dataset") and not st.button("hide"):
-        st.write(df.head(10))
-    plots = [{"plot": "count", "function": countplot}, {"plot": "boxplot", "function": boxplot}, {"plot": "violin", "function": violin}]
+        st.write(load_dataset("data/" + data_path).head(10))
+    report = dtype_report("data/" + data_path)
+    if report:
+        st.sidebar.caption(f"in memory: {report['after_mb']:.1f}MB instead of {report['before_mb']:.1f}MB")
+    plots = [{"plot": "count", "function": countplot}, {"plot": "boxplot", "function": boxplot}, {"plot": "violin", "function": violin}, {"plot": "histogram", "function": histogram}]
 
     plot = st.selectbox('Select a Plot', plots, format_func=lambda plot: plot['plot'])
-    plot['function'](df)
+    plot['function'](summary)
 
 
 
@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from sepsense.dtypes import optimize_dtypes
+
+# Parsed datasets shared by all pages. Streamlit reruns the page scripts on every
+# widget interaction but imports this module only once per server process, so the
+# cache survives reruns and is shared between sessions.
+_cache = OrderedDict()
+_reports = {}
+_lock = threading.Lock()
+_budget = {"bytes": int(float(os.environ.get("SEPSENSE_DATA_CACHE_MB", 512)) * 1024 ** 2)}
+
+
+def dataset_key(path):
+    """ Cache key of a file: absolute path plus modification time and size,
+    so an overwritten file is parsed again on the next access.
+    """
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def list_datasets(folder="data/", extensions=(".csv",)):
+    """ The datasets in folder, without the sidecar files (profiles, ...) next to them """
+    return sorted(f for f in os.listdir(folder) if f.endswith(extensions))
+
+
+def load_dataset(path):
+    """ inputs:
+            path: csv file, e.g. "data/neonatal.csv"
+
+        outputs:
+            the parsed DataFrame. It is shared with every other caller, so do not
+            modify it in place
+
+    - Returns the cached frame if the file did not change since it was parsed
+    - Columns are stored in compact dtypes (float32 features, int8 labels, ...), see
+      sepsense.dtypes.optimize_dtypes and dtype_report
+    - Least recently used frames are evicted once the memory budget is exceeded
+    """
+    key = dataset_key(path)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key][0]
+
+    df, report = optimize_dtypes(pd.read_csv(path))
+    _reports[key[0]] = report
+    nbytes = int(df.memory_usage(deep=True).sum())
+
+    with _lock:
+        # drop older versions of the same file
+        for old_key in [k for k in _cache if k[0] == key[0]]:
+            del _cache[old_key]
+        if nbytes <= _budget["bytes"]:
+            _cache[key] = (df, nbytes)
+            _evict()
+    return df
+
+
+def _evict():
+    while _cache and sum(nbytes for _, nbytes in _cache.values()) > _budget["bytes"]:
+        _cache.popitem(last=False)
+
+
+def set_memory_budget(megabytes):
+    """ Sets the memory budget of the dataset cache (default 512MB or $SEPSENSE_DATA_CACHE_MB) """
+    with _lock:
+        _budget["bytes"] = int(megabytes * 1024 ** 2)
+        _evict()
+
+
+def cache_info():
+    """ Returns the cached files with their size in MB, most recently used last """
+    with _lock:
+        return [
+            {"path": key[0], "size_mb": nbytes / 1024 ** 2}
+            for key, (_, nbytes) in _cache.items()
+        ]
+
+
+def dtype_report(path):
+    """ Memory before/after the dtype optimization of the last load of path, or None """
+    return _reports.get(os.path.abspath(path))
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,234 @@
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+# every page run and stage is appended here as one json line, so timings can be
+# compared across releases. Set SEPSENSE_DIAGNOSTICS_LOG="" to switch it off.
+LOG_PATH = os.environ.get(
+    "SEPSENSE_DIAGNOSTICS_LOG",
+    os.path.join(os.environ.get("SEPSENSE_CACHE_DIR", ".cache") or ".cache", "diagnostics.jsonl"),
+)
+# the log is rotated to <LOG_PATH>.1 once it is larger than this
+LOG_MAX_MB = float(os.environ.get("SEPSENSE_DIAGNOSTICS_LOG_MB", 10))
+# records are written in batches, not one file append per stage
+FLUSH_RECORDS = 200
+FLUSH_SECONDS = 30
+
+# the last records of all sessions of the server process
+_records = deque(maxlen=5000)
+_pending = []
+_last_flush = time.monotonic()
+_lock = threading.Lock()
+# tracemalloc is process-wide, the runs tracing at the same time share one
+# start/stop: runs is run id -> run, started is True if we started tracemalloc
+_tracing = {"runs": {}, "started": False}
+_tracing_lock = threading.Lock()
+# Streamlit runs the script of each session in its own thread
+_local = threading.local()
+# multiapp and every page import this module, pandas and psutil are only imported
+# once they are needed, so they do not add to the startup (see bench_startup)
+_process = None
+
+
+def _rss_mb():
+    global _process
+    if _process is None:
+        import psutil
+        _process = psutil.Process()
+    return _process.memory_info().rss / 1024 ** 2
+
+
+def _add(record):
+    with _lock:
+        _records.append(record)
+        if LOG_PATH:
+            _pending.append(record)
+            if len(_pending) >= FLUSH_RECORDS or time.monotonic() - _last_flush > FLUSH_SECONDS:
+                _flush()
+
+
+def _flush():
+    global _last_flush
+    _last_flush = time.monotonic()
+    if not LOG_PATH:
+        _pending.clear()
+    if not _pending:
+        return
+    os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+    if os.path.exists(LOG_PATH) and os.path.getsize(LOG_PATH) > LOG_MAX_MB * 1024 ** 2:
+        os.replace(LOG_PATH, f"{LOG_PATH}.1")
+    with open(LOG_PATH, "a") as f:
+        f.writelines(json.dumps(record, default=str) + "\n" for record in _pending)
+    _pending.clear()
+
+
+def flush():
+    """ Writes the records not yet in LOG_PATH (also done when the server exits) """
+    with _lock:
+        _flush()
+
+
+atexit.register(flush)
+
+
+def _start_tracing(run):
+    """ Starts tracemalloc for the first run that traces, the peak is reset only when
+    no other run is tracing (resetting it would zero the peak of the other runs)
+    """
+    with _tracing_lock:
+        runs = _tracing["runs"]
+        if runs:
+            # the peak of overlapping runs includes the allocations of the others
+            for other in runs.values():
+                other["shared_trace"] = True
+            run["shared_trace"] = True
+        else:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing["started"] = True
+            tracemalloc.reset_peak()
+        runs[run["id"]] = run
+
+
+def _stop_tracing(run):
+    """ returns: the peak of python allocations in bytes, None if another run traced at the same time """
+    with _tracing_lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        del _tracing["runs"][run["id"]]
+        if not _tracing["runs"] and _tracing["started"]:
+            tracemalloc.stop()
+            _tracing["started"] = False
+    return None if run.get("shared_trace") else peak
+
+
+@contextmanager
+def stage(name):
+    """ Times a hot path (data load, model load, fit, predict, plot, ...)
+
+    Useage:
+        with stage("data load"):
+            df = load_dataset(path)
+
+    The record belongs to the page run of the current thread, stages of background
+    jobs are logged with page "background".
+    """
+    run = getattr(_local, "run", None)
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        rss_after = _rss_mb()
+        _add({
+            "time": time.time(),
+            "run": run["id"] if run else None,
+            "page": run["page"] if run else "background",
+            "stage": name,
+            "seconds": time.perf_counter() - start,
+            "rss_mb": rss_after,
+            "rss_delta_mb": rss_after - rss_before,
+        })
+
+
+@contextmanager
+def page_run(page, profile=False, trace_memory=False):
+    """ Instruments one render of a page: wall time, process memory (RSS), optionally
+    the peak of python allocations (tracemalloc) and a cProfile of the render
+
+    yields: the run dict, after the block it holds the page record
+    """
+    run = {"id": uuid.uuid4().hex[:8], "page": page}
+    _local.run = run
+    if trace_memory:
+        _start_tracing(run)
+    profiler = cProfile.Profile() if profile else None
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield run
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        seconds = time.perf_counter() - start
+        rss_after = _rss_mb()
+        record = {
+            "time": time.time(),
+            "run": run["id"],
+            "page": page,
+            "stage": "page",
+            "seconds": seconds,
+            "rss_mb": rss_after,
+            "rss_delta_mb": rss_after - rss_before,
+        }
+        if trace_memory:
+            peak = _stop_tracing(run)
+            # None: another session traced at the same time, the peak would mix both
+            record["python_peak_mb"] = peak / 1024 ** 2 if peak is not None else None
+        if profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(25)
+            run["profile"] = out.getvalue()
+        _local.run = None
+        _add(record)
+        run["record"] = record
+
+
+def records(run=None):
+    """ The recorded page runs and stages (of one run), oldest first """
+    with _lock:
+        return [record for record in _records if run is None or record["run"] == run]
+
+
+def to_json(rows):
+    return json.dumps(rows, default=str, indent=1)
+
+
+def to_csv(rows):
+    import pandas as pd
+    return pd.DataFrame(rows).to_csv(index=False)
+
+
+def diagnostics_options():
+    """ Sidebar switches for the expensive instrumentation """
+    with st.sidebar.expander("diagnostics"):
+        return {
+            "profile": st.checkbox("profile pages with cProfile", key="diagnostics_profile"),
+            "trace_memory": st.checkbox("trace python allocations (slower)", key="diagnostics_trace_memory"),
+        }
+
+
+def diagnostics_panel(run):
+    """ Timings of the page run that just finished plus the history of this server """
+    import pandas as pd
+    with st.sidebar.expander("diagnostics of this page"):
+        page = run["record"]
+        st.write(f"{page['page']}: {page['seconds'] * 1000:.0f}ms, {page['rss_mb']:.0f}MB RSS "
+                 f"({page['rss_delta_mb']:+.1f}MB)"
+                 + (f", python peak {page['python_peak_mb']:.1f}MB" if page.get("python_peak_mb") is not None else "")
+                 + (", python peak shared with another session" if page.get("python_peak_mb", 0) is None else ""))
+        stages = [record for record in records(run["id"]) if record["stage"] != "page"]
+        if stages:
+            st.dataframe(pd.DataFrame(stages)[["stage", "seconds", "rss_delta_mb"]])
+        if "profile" in run:
+            st.text(run["profile"])
+
+        history = pd.DataFrame(records())
+        if len(history):
+            st.write("median seconds over all runs")
+            st.dataframe(history.groupby(["page", "stage"])["seconds"].agg(["median", "max", "count"]))
+            rows = records()
+            st.download_button("export json", to_json(rows), file_name="diagnostics.json", key="diagnostics_json")
+            st.download_button("export csv", to_csv(rows), file_name="diagnostics.csv", key="diagnostics_csv")
@@ -3,40 +3,16 @@ import pandas as pd
 import numpy as np
 import pathlib
 
-# ML imports
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from imblearn.over_sampling import SMOTE
-from imblearn.under_sampling import RandomUnderSampler
-from sklearn.utils import resample
-from sklearn.preprocessing import StandardScaler
-from sklearn.feature_selection import (
-    RFE,
-    SelectKBest,
-    mutual_info_classif,
-    SelectFromModel,
-)
-from sklearn.linear_model import LogisticRegression
-from sklearn.svm import SVC
-from xgboost import XGBClassifier
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.naive_bayes import GaussianNB
-from sklearn.metrics import accuracy_score
-import joblib
-
-def map_to_binary(value):
-    if value == 1 or value in [4, 5]:
-        return 1
-    else:
-        return 0
-
+from sepsense.cleaning import compile_spec, run_spec, target_spec
 
-def clean_data(df, name, list_intresting_parameters, pred_col):
+def clean_data(df, name, list_intresting_parameters, pred_col, label_mapping=None):
     """ inputs:
             df: dataframe to clean
             name: string to save to csv
             list_intresting_parameters: columns to use
+            label_mapping: optional mapping of the target codes to classes ("binary",
+                "multiclass" or a dict, see sepsense.labels.map_labels). None keeps the
+                target as it is
 
        outputs:
            saves a csv
@@ -45,13 +21,32 @@ def clean_data(df, name, list_intresting_parameters, pred_col):
     - groups all NaN values
 
     """
-    df = df[(list_intresting_parameters+[pred_col])]
-    df.replace("NI", np.nan, inplace=True)
-    df["target"] = df[pred_col]
-    df = df.drop(columns=[pred_col])
-    df = df.dropna()
+    clean = compile_spec(target_spec(list_intresting_parameters, pred_col, label_mapping))
+    df = clean(df)
     df.to_csv(f"data/{name}.csv", index=False)
 
+def clean_data_chunked(source, name, list_intresting_parameters, pred_col, chunksize=100_000, label_mapping=None):
+    """ inputs:
+            source: csv file (path or uploaded file) to clean
+            name: string to save to csv
+            list_intresting_parameters: columns to use
+            chunksize: rows held in memory at once
+            label_mapping: see clean_data
+
+       outputs:
+           saves data/{name}.csv and returns rows_in, rows_out, seconds, rows_per_s and
+           cached (True if the same file was already cleaned the same way)
+
+    - Same cleaning as clean_data, but the file is read, cleaned and written chunk by
+      chunk so memory stays constant however large the input is
+    - Not byte-identical to clean_data: numeric features are written as floats in
+      every chunk (1.0 where clean_data may write 1), see sepsense.cleaning.run_spec
+    - data/{name}.csv is replaced only when the cleaning finished, a failed upload
+      leaves no truncated dataset behind
+    """
+    spec = target_spec(list_intresting_parameters, pred_col, label_mapping)
+    return run_spec(spec, source, f"data/{name}.csv", chunksize=chunksize)
+
 def train_and_save_model(
     data_path,
     model_name="LR",
@@ -61,6 +56,27 @@ def train_and_save_model(
     model_path="saved_model.pkl",
     number_of_features=5,
 ):
+    # ML imports here instead of at module level, so the Data Cleaner page (which
+    # only needs clean_data_chunked) does not load sklearn, imblearn and xgboost
+    from sklearn.model_selection import train_test_split
+    from imblearn.over_sampling import SMOTE
+    from imblearn.under_sampling import RandomUnderSampler
+    from sklearn.utils import resample
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.feature_selection import (
+        RFE,
+        SelectKBest,
+        mutual_info_classif,
+        SelectFromModel,
+    )
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.svm import SVC
+    from xgboost import XGBClassifier
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.naive_bayes import GaussianNB
+    from sklearn.metrics import accuracy_score
+
     data = pd.read_csv(data_path)
 
     # Splitting data
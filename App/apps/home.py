@@ -1,5 +1,4 @@
 import streamlit as st
-import matplotlib.pyplot as plt
 
 
 def app():
@@ -18,7 +17,7 @@ def app():
     - This can cause issues in adulthood
 """)
 
-    st.image(plt.imread('images/baby.png'))
+    st.image('images/baby.png')
     st.markdown("""
 - Data is very private
     - This app allows for total data privacy and data can be kept local
@@ -0,0 +1,116 @@
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.feature_selection import SelectorMixin
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MaxAbsScaler, MinMaxScaler, RobustScaler, StandardScaler
+from sklearn.utils import Bunch
+
+# transformers that scale every column on its own: permuting a column before or after
+# them gives the same matrix, so the permutation can be done on the transformed data
+COLUMNWISE = (StandardScaler, MinMaxScaler, RobustScaler, MaxAbsScaler)
+
+
+def _preprocessed(pipe, X):
+    """ Returns (final estimator, transformed X, column of every input feature in the
+    transformed X or -1 if it was dropped), or None if the pipeline mixes columns
+    """
+    if not isinstance(pipe, Pipeline):
+        return None
+    columns = np.arange(X.shape[1])
+    for _, step in pipe.steps[:-1]:
+        if isinstance(step, SelectorMixin):
+            columns = columns[step.get_support()]
+        elif not isinstance(step, COLUMNWISE):
+            return None
+    position = np.full(X.shape[1], -1)
+    position[columns] = np.arange(len(columns))
+    return pipe.steps[-1][1], pipe[:-1].transform(X), position
+
+
+def _permute_feature(estimator, X, y, column, baseline, n_repeats, min_repeats, tol, seed):
+    rng = np.random.RandomState(seed)
+    X = X.copy()
+    original = X[:, column].copy()
+    drops = []
+    for repeat in range(n_repeats):
+        X[:, column] = original[rng.permutation(len(original))]
+        drops.append(baseline - estimator.score(X, y))
+        # stop once the 95% confidence interval of the mean is tighter than tol
+        if repeat + 1 >= min_repeats:
+            half_width = 1.96 * np.std(drops, ddof=1) / np.sqrt(len(drops))
+            if half_width < tol:
+                break
+    return np.array(drops)
+
+
+def fast_permutation_importance(pipe, X, y, n_repeats=10, min_repeats=3, tol=0.005, n_jobs=-1, random_state=42):
+    """ Permutation importance like sklearn.inspection.permutation_importance, but
+
+    - for pipelines of scalers and feature selectors the data is transformed once and
+      the columns are permuted in the transformed matrix, features dropped by the
+      selector get importance 0 without being scored
+    - features are scored in parallel on n_jobs threads
+    - a feature stops repeating once the 95% confidence interval of its mean
+      importance is narrower than +-tol (after at least min_repeats)
+
+    returns: Bunch with importances_mean, importances_std, n_repeats (done per
+        feature), seconds, and time_saved (estimated serial sklearn time minus seconds)
+    """
+    start = time.perf_counter()
+    X_values = np.asarray(X, dtype=float)
+    y = np.asarray(y)
+
+    # what one sklearn repeat for one feature costs: scoring the whole pipeline
+    baseline = pipe.score(X, y)
+    full_score_seconds = time.perf_counter() - start
+
+    fast = _preprocessed(pipe, X)
+    if fast is not None:
+        estimator, X_scored, position = fast
+        baseline = estimator.score(X_scored, y)
+    else:
+        estimator, X_scored, position = pipe, X_values, np.arange(X_values.shape[1])
+        if getattr(pipe, "feature_names_in_", None) is not None:
+            # the pipeline expects the column names it was fitted with
+            estimator = _NamedColumns(pipe, pipe.feature_names_in_)
+
+    n_features = X_values.shape[1]
+    scored = [j for j in range(n_features) if position[j] >= 0]
+    results = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_permute_feature)(
+            estimator, X_scored, y, position[j], baseline, n_repeats, min_repeats, tol, random_state + j
+        )
+        for j in scored
+    )
+
+    means = np.zeros(n_features)
+    stds = np.zeros(n_features)
+    repeats = np.zeros(n_features, dtype=int)
+    for j, drops in zip(scored, results):
+        means[j] = drops.mean()
+        stds[j] = drops.std()
+        repeats[j] = len(drops)
+
+    seconds = time.perf_counter() - start
+    serial_seconds = full_score_seconds * n_repeats * n_features
+    return Bunch(
+        importances_mean=means,
+        importances_std=stds,
+        n_repeats=repeats,
+        seconds=seconds,
+        time_saved=max(serial_seconds - seconds, 0.0),
+    )
+
+
+class _NamedColumns:
+    """ Scores a pipeline fitted on a DataFrame with a plain matrix """
+
+    def __init__(self, pipe, columns):
+        self.pipe = pipe
+        self.columns = list(columns)
+
+    def score(self, X, y):
+        return self.pipe.score(pd.DataFrame(X, columns=self.columns), y)
@@ -1,26 +1,54 @@
 
 import streamlit as st
-import joblib
 from datetime import time
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import io
 import os
+from apps.datasets import list_datasets
+from apps.diagnostics import stage
+from apps.profiling import load_profile
+from apps.registry import registry
+from apps.scoring import score_file
 
 def app():
     st.title('Use a pre-trained model model to predict Sepsis')
     
-    model_path = st.selectbox("select a model", os.listdir("models/"))
-    model = joblib.load(f"models/{model_path}")
+    model_path = st.selectbox("select a model", registry.list_models())
+    with stage("model load"):
+        model = registry.get(model_path)
+    with st.expander("loaded models"):
+        st.dataframe(pd.DataFrame(registry.stats()))
 
-    data_path = st.selectbox("select the training data", os.listdir("data/"))
-    df = pd.read_csv("data/" +data_path)
-    df = df.iloc[:, :-1]
-    columns = df.columns.to_list()
+    mode = st.radio("What do you want to score?", ["single neonate", "batch file"], horizontal=True)
+    if mode == "batch file":
+        batch(model)
+    else:
+        single(model)
+
+def batch(model):
+    uploaded_file = st.file_uploader("Upload a csv or parquet file with one neonate per row", type=["csv", "parquet"])
+    chunksize = st.number_input("rows scored at once", 1_000, 1_000_000, 50_000, step=10_000)
+    if uploaded_file is None:
+        st.info('Awaiting for a file to be uploaded.')
+        return
+    if st.button("Press to score the file"):
+        output = io.StringIO()
+        with stage("predict"):
+            stats = score_file(model, uploaded_file, output, chunksize=int(chunksize))
+        st.write(f"scored {stats['rows']} rows in {stats['seconds']:.2f}s ({stats['rows_per_s']:.0f} rows/s)")
+        st.download_button("download the probabilities", data=output.getvalue(), file_name="predictions.csv")
+
+def single(model):
+    data_path = st.selectbox("select the training data", list_datasets())
+    # ranges from the profile sidecar, the dataset itself is not read
+    with stage("data load"):
+        profile = load_profile("data/" + data_path)
+    columns = list(profile["columns"])[:-1]
     st.sidebar.write("Please adjust the following sliders to match the concerned neonate")
     feature_count = []
     for i, col in enumerate(columns):
-        feature_count.append(st.sidebar.slider(col, df[col].min(), df[col].max()))
+        feature_count.append(st.sidebar.slider(col, profile["columns"][col]["min"], profile["columns"][col]["max"]))
 
     values = []
     for i in range(len(feature_count)):
@@ -29,12 +57,13 @@ def app():
     values = values[None,...]
 
     #if st.button("Press to run inference"):
-    prediction = model.predict_proba(values)
+    with stage("predict"):
+        prediction = model.predict_proba(values)
     st.write(f"# Prediction for Sepsis: {prediction[0,1]*100:.2f}%")
 
     if prediction[0,0] < prediction[0,1]:
         st.write("# Model has predicted Sepsis likely. Please take nessecary action")
-        st.image(plt.imread('images/Danger.jpg'))
+        st.image('images/Danger.jpg')
 
     else: 
         st.markdown("# Model has predicted Sepsis NOT likely but continue to monitor symptoms")
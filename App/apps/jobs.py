@@ -0,0 +1,131 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Cancelled(Exception):
+    """ Raised inside a job by Job.report once the job was cancelled """
+
+
+class Job:
+    """ A background task. The task function receives the job as first argument and
+    calls job.report(progress, message) between its stages, which is also where a
+    cancel request takes effect.
+    """
+
+    def __init__(self, job_id, name):
+        self.id = job_id
+        self.name = name
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    def report(self, progress, message=""):
+        if self._cancel.is_set():
+            raise Cancelled()
+        self.progress = progress
+        self.message = message
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobQueue:
+    """ Runs jobs on a local worker pool
+
+    Useage:
+        job = job_queue.submit("train xgboost", train, data)
+        job.status, job.progress, job.message
+        job_queue.cancel(job.id)
+
+    Finished jobs are kept for ttl seconds and at most max_finished of them, the queue
+    is shared by every session and would otherwise keep all results and errors alive.
+    Their results are in the result store, the jobs are only needed to show the status.
+    """
+
+    def __init__(self, max_workers=2, ttl=3600, max_finished=100):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        """ Drops finished jobs older than ttl and the oldest above max_finished (under the lock) """
+        now = time.time()
+        finished = sorted((job.finished or job.submitted, job.id) for job in self._jobs.values() if job.done)
+        for i, (finished_at, job_id) in enumerate(finished):
+            if now - finished_at > self.ttl or len(finished) - i > self.max_finished:
+                del self._jobs[job_id]
+
+    def submit(self, name, func, *args, **kwargs):
+        with self._lock:
+            self._prune()
+            job = Job(next(self._ids), name)
+            self._jobs[job.id] = job
+        job._future = self._pool.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        if job._cancel.is_set():
+            job.status = "cancelled"
+            return
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.progress = 1.0
+            job.status = "done"
+        except Cancelled:
+            job.status = "cancelled"
+        except Exception as error:
+            job.error = repr(error)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self, job_ids=None):
+        with self._lock:
+            self._prune()
+        if job_ids is None:
+            return list(self._jobs.values())
+        return [self._jobs[job_id] for job_id in job_ids if job_id in self._jobs]
+
+    def cancel(self, job_id):
+        """ Queued jobs never start, running jobs stop at their next report() """
+        job = self._jobs.get(job_id)
+        if job is None or job.done:
+            return
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            job.status = "cancelled"
+            job.finished = time.time()
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+
+# shared by all sessions of the server process, so jobs survive reruns
+job_queue = JobQueue(max_workers=int(os.environ.get("SEPSENSE_TRAINING_WORKERS", 2)),
+                     ttl=float(os.environ.get("SEPSENSE_JOB_TTL", 3600)))
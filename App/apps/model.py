@@ -1,6 +1,8 @@
 import os
+import time
 import streamlit as st
 import pickle
+import joblib
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
@@ -13,9 +15,21 @@ from imblearn.under_sampling import RandomUnderSampler
 from sklearn.feature_selection import SelectFromModel
 from sklearn.pipeline import make_pipeline
 from sklearn.metrics import confusion_matrix, classification_report
-from sklearn.inspection import permutation_importance
 from sklearn.naive_bayes import GaussianNB
 from sklearn.feature_selection import SelectKBest, mutual_info_classif
+from apps.datasets import dataset_key, list_datasets, load_dataset
+from apps.diagnostics import stage
+from apps.importance import fast_permutation_importance
+from apps.jobs import job_queue
+from apps.results import config_hash, result_store
+
+# Preprocessing results are cached on disk, keyed by a hash of the data and parameters
+memory = joblib.Memory(os.environ.get("SEPSENSE_CACHE_DIR", ".cache") or None, verbose=0)
+
+@memory.cache
+def smote_resample(X_train, y_train):
+    smote = SMOTE(sampling_strategy="auto", random_state=42)
+    return smote.fit_resample(X_train, y_train)
 
 def app():
     st.markdown("""
@@ -23,13 +37,12 @@ def app():
                 - prototype phase right now
                 - want to be able to select features and then in the interference we will want to be able to save those features and create sliders
                 """)
-    # Initialization
-    st.session_state['train'] = 'false' 
-    st.session_state['done'] = 'false'
-    
+    st.session_state.setdefault('jobs', [])
+
     st.sidebar.write("1. Choose the cleaned dataset")
-    data_path = st.sidebar.selectbox("select the training data", os.listdir("data/"))
-    df = pd.read_csv("data/" +data_path)
+    data_path = st.sidebar.selectbox("select the training data", list_datasets())
+    with stage("data load"):
+        df = load_dataset("data/" + data_path)
     #csv = st.sidebar.file_uploader("select the dataset to train the model on")
 
     #if csv != None and not saved:
@@ -60,35 +73,110 @@ def app():
     n_features = st.sidebar.slider('number of features', 3, len(columns))
 
 
-    X_train, X_test, y_train, y_test = train_test_split(df_x, df_y, test_size=ratio, random_state=42)
-
-    if st.button('press to train'):
-        st.session_state['train'] = 'true'
+    # Finished trainings are stored by configuration, showing or downloading them again costs nothing
+    key = config_hash(data=dataset_key("data/" + data_path), model=model['model'], norm=norm['norm'], ratio=ratio, n_features=n_features)
+    stored = result_store.get(key)
 
-    if st.session_state['train'] == 'true' and st.session_state['done'] == 'false':
+    # Training runs in the background, the page only polls the jobs of this session
+    if st.button('press to train' if stored is None else 'press to train again'):
+        job = job_queue.submit(
+            f"{name or model['model']} ({model['model']}, {norm['norm']}, {n_features} features, {data_path})",
+            train, key, model['object'], norm['object'], n_features, ratio, df_x, df_y,
+        )
+        st.session_state['jobs'].append((job.id, key, name or model['model']))
 
-        # Upsampling seems to do much better than downsampling
-        smote = SMOTE(sampling_strategy="auto", random_state=42)
-        X_train, y_train = smote.fit_resample(X_train, y_train)
+    show_jobs(current_key=key)
+    if stored is not None and key not in [job_key for _, job_key, _ in st.session_state['jobs']]:
+        st.write("### Stored result for the selected settings")
+        show_result(stored, key, name or model['model'])
 
-# Now create a pipeline that we can save for inference
-        pipe = make_pipeline(norm['object'](),SelectKBest(mutual_info_classif, k=n_features),model['object']())
-        pipe.fit(X_train, y_train)
-        st.session_state['done'] = 'true'
-    if st.session_state['done'] == 'true':
-        st.write(round(pipe.score(X_test, y_test), 2))
-        st.dataframe(classification_report(pipe.predict(X_test), y_test, output_dict=True))
+def train(job, key, model, norm, n_features, ratio, df_x, df_y):
+    """ Background training job, stores the fitted pipeline with its evaluation under key
 
-        cm = confusion_matrix(pipe.predict(X_test), y_test)
-        plot_confusion_matrix(cm)
+    The name of the model is not part of the result, the same settings under another
+    name are the same training. The page passes the name to show_result.
+    """
+    X_train, X_test, y_train, y_test = train_test_split(df_x, df_y, test_size=ratio, random_state=42)
 
-        feature_importances = permutation_importance(pipe, X_test, y_test, n_repeats=10, random_state=42)
-        features = df_x.columns.to_list()
-        plot_importance(features, feature_importances.importances_mean)
+    # Upsampling seems to do much better than downsampling
+    job.report(0.05, "resampling with SMOTE")
+    with stage("resample"):
+        X_train, y_train = smote_resample(X_train, y_train)
 
-        download =  st.download_button("download the model", data=pickle.dumps(pipe), file_name=f"{name}.pkl")
-        if download:
-            st.write("congrats, the model was saved")
+# Now create a pipeline that we can save for inference
+    # the scaler and SelectKBest fits are cached, only the model is refit when the data did not change
+    job.report(0.2, "fitting the pipeline")
+    pipe = make_pipeline(norm(),SelectKBest(mutual_info_classif, k=n_features),model(), memory=memory)
+    with stage("fit"):
+        pipe.fit(X_train, y_train)
+    pipe.set_params(memory=None)
+
+    job.report(0.6, "evaluating on the test data")
+    with stage("predict"):
+        y_pred = pipe.predict(X_test)
+    result = {
+        "score": pipe.score(X_test, y_test),
+        "report": classification_report(y_pred, y_test, output_dict=True),
+        "cm": confusion_matrix(y_pred, y_test),
+        "features": X_test.columns.to_list(),
+    }
+
+    job.report(0.7, "computing permutation importance")
+    with stage("permutation importance"):
+        importances = fast_permutation_importance(pipe, X_test, y_test, n_repeats=10, random_state=42)
+    result["importances"] = importances.importances_mean
+    result["importance_seconds"] = importances.seconds
+    result["importance_time_saved"] = importances.time_saved
+    # only the fitted pipeline is stored, the download is pickled from it when shown
+    result["pipe"] = pipe
+    result_store.put(key, result)
+    return key
+
+def show_jobs(current_key=None):
+    # jobs the queue pruned (finished long ago), their results stay in the result store
+    st.session_state['jobs'] = [entry for entry in st.session_state['jobs'] if job_queue.get(entry[0]) is not None]
+    names = {job_id: name for job_id, _, name in st.session_state['jobs']}
+    jobs = job_queue.jobs(list(names))
+    for job in reversed(jobs):
+        with st.expander(f"{job.name}: {job.status} ({job.seconds:.0f}s)", expanded=job is jobs[-1] or job.result == current_key):
+            if not job.done:
+                st.progress(job.progress, text=job.message)
+                if st.button("cancel", key=f"cancel_{job.id}"):
+                    job_queue.cancel(job.id)
+            elif job.status == "done":
+                show_result(result_store.get(job.result), job.id, names[job.id])
+            elif job.status == "failed":
+                st.error(job.error)
+            if job.done and st.button("remove", key=f"remove_{job.id}"):
+                st.session_state['jobs'] = [entry for entry in st.session_state['jobs'] if entry[0] != job.id]
+                job_queue.forget(job.id)
+                st.rerun()
+
+    # poll until every job of this session finished
+    if any(not job.done for job in jobs):
+        with stage("wait for jobs"):
+            time.sleep(1)
+        st.rerun()
+
+def model_bytes(result):
+    """ The pickled pipeline for the download, built once per loaded result """
+    if "model_bytes" not in result:
+        result["model_bytes"] = pickle.dumps(result["pipe"])
+    return result["model_bytes"]
+
+def show_result(result, key, name):
+    st.write(round(result["score"], 2))
+    st.dataframe(result["report"])
+
+    with stage("plot"):
+        plot_confusion_matrix(result["cm"])
+        plot_importance(result["features"], result["importances"])
+    if "importance_seconds" in result:
+        st.caption(f"importance computed in {result['importance_seconds']:.1f}s, about {result['importance_time_saved']:.1f}s faster than plain permutation_importance")
+
+    download =  st.download_button("download the model", data=model_bytes(result), file_name=f"{name}.pkl", key=f"download_{key}")
+    if download:
+        st.write("congrats, the model was saved")
 
 def plot_confusion_matrix(cm):
         fig = plt.figure(figsize=(6, 6))
@@ -0,0 +1,157 @@
+import os
+import threading
+
+import joblib
+import numpy as np
+
+from apps.profiling import load_profile
+from sepsense.feature_store import feature_store
+
+PLOT_DIR = os.path.join(os.environ.get("SEPSENSE_CACHE_DIR", ".cache") or ".cache", "plots")
+
+# summaries of every dataset version opened since the server started
+_summaries = {}
+_lock = threading.Lock()
+
+
+def _box_stats(values, max_fliers=500):
+    """ The numbers ax.bxp needs (Tukey whiskers at 1.5 IQR), outliers subsampled """
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    fliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+    if len(fliers) > max_fliers:
+        fliers = fliers[np.linspace(0, len(fliers) - 1, max_fliers).astype(int)]
+    return {
+        "q1": q1, "med": med, "q3": q3, "iqr": iqr, "mean": values.mean(),
+        "whislo": inside.min() if len(inside) else q1,
+        "whishi": inside.max() if len(inside) else q3,
+        "fliers": fliers,
+    }
+
+
+def _binned_kde(values, points=128, cut=2):
+    """ Gaussian KDE on a grid: histogram with points bins smoothed with the kernel
+    (Scott's bandwidth, cut bandwidths past the data like seaborn). O(n + points)
+    instead of O(n x points).
+    """
+    std = values.std()
+    if len(values) < 2 or std == 0:
+        return None
+    bandwidth = std * len(values) ** (-1 / 5)
+    grid = np.linspace(values.min() - cut * bandwidth, values.max() + cut * bandwidth, points)
+    step = grid[1] - grid[0]
+    counts, _ = np.histogram(values, bins=points, range=(grid[0] - step / 2, grid[-1] + step / 2))
+    radius = min(int(np.ceil(4 * bandwidth / step)), points - 1)
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) * step / bandwidth) ** 2)
+    # mode="same" returns len(kernel) values when the kernel is longer than the grid
+    # (wide bandwidth, e.g. a 0/1 flag in a small class), so take the centred points
+    density = np.convolve(counts, kernel, mode="full")[radius:radius + points]
+    density = density / (len(values) * bandwidth * np.sqrt(2 * np.pi))
+    return {"grid": grid, "density": density}
+
+
+def summarize(X, y, columns, bins=30, kde_points=128):
+    """ inputs:
+            X: rows x features (e.g. the memory-mapped matrix of the feature store)
+            y: target per row
+            columns: feature names of the columns of X
+
+       outputs:
+           {"classes", "counts", "features": {feature: {"edges", class: {"box", "hist", "kde", "n"}}}}
+    """
+    classes, counts = np.unique(y, return_counts=True)
+    masks = {cls: np.asarray(y) == cls for cls in classes}
+    features = {}
+    for j, column in enumerate(columns):
+        values = np.asarray(X[:, j], dtype=np.float64)
+        finite = values[~np.isnan(values)]
+        if not len(finite):
+            continue
+        # shared bin edges, so the histograms of the classes line up
+        edges = np.histogram_bin_edges(finite, bins=bins)
+        summary = {"edges": edges}
+        for cls, mask in masks.items():
+            class_values = values[mask]
+            class_values = class_values[~np.isnan(class_values)]
+            if not len(class_values):
+                continue
+            summary[cls] = {
+                "n": len(class_values),
+                "box": _box_stats(class_values),
+                "hist": np.histogram(class_values, bins=edges)[0],
+                "kde": _binned_kde(class_values, kde_points),
+            }
+        features[column] = summary
+    return {"classes": list(classes), "counts": list(counts), "features": features}
+
+
+def dataset_summary(path, target="target"):
+    """ Plot summaries of a csv in data/, computed once per version of the file
+
+    The csv goes through the feature store (parsed once), the summaries are kept in
+    memory and in PLOT_DIR, so redrawing any feature does not touch the rows again.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    # text columns (e.g. IDs) are not plotted and not numeric features of the store
+    text = [col for col, info in load_profile(path, target)["columns"].items() if info["dtype"] == "text"]
+    version = feature_store.build_from_csv(name, path, target=target, exclude=text)
+    key = f"{name}_{version}"
+    with _lock:
+        if key in _summaries:
+            return _summaries[key]
+
+    cache_path = os.path.join(PLOT_DIR, f"{key}.joblib")
+    if os.path.exists(cache_path):
+        summary = joblib.load(cache_path)
+    else:
+        X, y, meta = feature_store.get(name, version)
+        summary = summarize(X, y, meta["columns"])
+        os.makedirs(PLOT_DIR, exist_ok=True)
+        joblib.dump(summary, cache_path)
+    with _lock:
+        _summaries[key] = summary
+    return summary
+
+
+def draw_counts(ax, summary):
+    ax.bar([str(cls) for cls in summary["classes"]], summary["counts"], color=[f"C{i}" for i in range(len(summary["classes"]))])
+    ax.set(xlabel="target", ylabel="count")
+
+
+def draw_box(ax, summary, feature):
+    stats = summary["features"][feature]
+    classes = [cls for cls in summary["classes"] if cls in stats]
+    boxes = ax.bxp([{**stats[cls]["box"], "label": str(cls)} for cls in classes], showfliers=True, patch_artist=True)
+    for i, patch in enumerate(boxes["boxes"]):
+        patch.set_facecolor(f"C{i}")
+    ax.set(xlabel="target", ylabel=feature)
+
+
+def draw_violin(ax, summary, feature):
+    stats = summary["features"][feature]
+    classes = [cls for cls in summary["classes"] if cls in stats]
+    for i, cls in enumerate(classes):
+        kde = stats[cls]["kde"]
+        box = stats[cls]["box"]
+        if kde is not None:
+            width = 0.4 * kde["density"] / kde["density"].max()
+            ax.fill_betweenx(kde["grid"], i - width, i + width, color=f"C{i}", alpha=0.8)
+        # inner box like seaborn: whiskers as a thin line, quartiles as a thick one, median as a dot
+        ax.vlines(i, box["whislo"], box["whishi"], color="0.25", linewidth=1)
+        ax.vlines(i, box["q1"], box["q3"], color="0.25", linewidth=5)
+        ax.scatter([i], [box["med"]], color="white", zorder=3, s=15)
+    ax.set_xticks(range(len(classes)), [str(cls) for cls in classes])
+    ax.set(xlabel="target", ylabel=feature)
+
+
+def draw_hist(ax, summary, feature):
+    stats = summary["features"][feature]
+    edges = stats["edges"]
+    for i, cls in enumerate(summary["classes"]):
+        if cls in stats:
+            # density, so the classes are comparable despite the imbalance
+            ax.stairs(stats[cls]["hist"] / (stats[cls]["n"] * np.diff(edges)), edges, fill=True, alpha=0.5,
+                      color=f"C{i}", label=str(cls))
+    ax.legend(title="target")
+    ax.set(xlabel=feature, ylabel="density")
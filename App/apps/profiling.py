@@ -0,0 +1,201 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def sidecar_path(path):
+    """ The profile of data/neonatal.csv is stored in data/neonatal.csv.profile.json """
+    return f"{path}.profile.json"
+
+
+def _number(value):
+    """ numpy scalars -> plain python numbers for json (NaN -> None) """
+    if value is None or pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+class _ColumnStats:
+    """ Running statistics of one column over the chunks of a file """
+
+    def __init__(self, max_distinct):
+        self.max_distinct = max_distinct
+        self.count = 0
+        self.missing = 0
+        self.numeric = True
+        self.integer = True
+        self.minimum = None
+        self.maximum = None
+        # value -> count, also the class balance if the column is picked as target later
+        self.counts = {}
+        self.distinct_exact = True
+        # pairwise sums with the target for the correlation
+        self.n_pairs = 0
+        self.sums = np.zeros(5)  # x, y, xx, yy, xy
+
+    def update(self, values, target=None):
+        self.count += len(values)
+        missing = values.isna()
+        self.missing += int(missing.sum())
+        present = values[~missing]
+        if self.distinct_exact:
+            for value, count in present.value_counts().items():
+                self.counts[value] = self.counts.get(value, 0) + int(count)
+            if len(self.counts) > self.max_distinct:
+                self.distinct_exact = False
+                self.counts = {}
+        if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            self.numeric = False
+            return
+        self.integer &= pd.api.types.is_integer_dtype(values) or bool((present % 1 == 0).all())
+        if len(present):
+            low, high = present.min(), present.max()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+        if target is not None:
+            pair = ~missing.to_numpy() & ~np.isnan(target)
+            x = values.to_numpy(dtype=np.float64)[pair]
+            y = target[pair]
+            self.n_pairs += len(x)
+            self.sums += [x.sum(), y.sum(), (x * x).sum(), (y * y).sum(), (x * y).sum()]
+
+    def correlation(self):
+        n = self.n_pairs
+        if n < 2:
+            return None
+        sx, sy, sxx, syy, sxy = self.sums
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        if var_x <= 0 or var_y <= 0:
+            return None
+        return float((sxy - sx * sy / n) / np.sqrt(var_x * var_y))
+
+
+def profile_file(source, target="target", chunksize=100_000, sample_size=100_000, max_distinct=10_000,
+                 max_classes=100, seed=42):
+    """ inputs:
+            source: csv file (path or file object)
+            target: target column for the class balance and correlations (None if unknown)
+
+       outputs:
+           {"rows", "target", "classes", "seconds", "columns": {column: {"dtype", "missing",
+           "missing_pct", "min", "max", "mean", "quantiles", "distinct", "distinct_exact",
+           "value_counts", "corr_target"}}}
+
+    - One pass over the file chunk by chunk, memory stays bounded
+    - Quantiles come from a uniform sample of sample_size rows (smallest random keys)
+    - Distinct counts are exact up to max_distinct values, above that distinct is
+      max_distinct and distinct_exact False
+    - Columns with at most max_classes distinct values keep their value counts, so
+      class_balance works for any column without another pass
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    stats = {}
+    classes = {}
+    sample, sample_keys = None, None
+    rows = 0
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        rows += len(chunk)
+        y = None
+        if target is not None and target in chunk:
+            for value, count in chunk[target].value_counts(dropna=False).items():
+                key = str(_number(value))
+                classes[key] = classes.get(key, 0) + int(count)
+            if pd.api.types.is_numeric_dtype(chunk[target]):
+                y = chunk[target].to_numpy(dtype=np.float64)
+        for column in chunk.columns:
+            stats.setdefault(column, _ColumnStats(max_distinct)).update(chunk[column], None if column == target else y)
+
+        numeric = chunk.select_dtypes("number")
+        keys = rng.random(len(numeric))
+        if sample is not None:
+            numeric = pd.concat([sample, numeric], ignore_index=True)
+            keys = np.concatenate([sample_keys, keys])
+        if len(keys) > sample_size:
+            keep = np.argpartition(keys, sample_size)[:sample_size]
+            numeric, keys = numeric.iloc[keep].reset_index(drop=True), keys[keep]
+        sample, sample_keys = numeric, keys
+
+    columns = {}
+    for column, column_stats in stats.items():
+        info = {
+            "dtype": "text" if not column_stats.numeric else ("int" if column_stats.integer else "float"),
+            "missing": column_stats.missing,
+            "missing_pct": 100 * column_stats.missing / max(column_stats.count, 1),
+            "distinct": len(column_stats.counts) if column_stats.distinct_exact else max_distinct,
+            "distinct_exact": column_stats.distinct_exact,
+        }
+        if column_stats.distinct_exact and len(column_stats.counts) <= max_classes:
+            info["value_counts"] = {str(_number(value)): count for value, count in column_stats.counts.items()}
+            if column_stats.missing:
+                info["value_counts"][str(None)] = column_stats.missing
+        if column_stats.numeric and sample is not None and column in sample:
+            values = sample[column].dropna()
+            cast = int if column_stats.integer and column_stats.minimum is not None else _number
+            info.update({
+                "min": cast(column_stats.minimum) if column_stats.minimum is not None else None,
+                "max": cast(column_stats.maximum) if column_stats.maximum is not None else None,
+                "mean": _number(values.mean()) if len(values) else None,
+                "quantiles": {str(q): _number(v) for q, v in zip(QUANTILES, values.quantile(QUANTILES))} if len(values) else {},
+                "corr_target": None if column == target else column_stats.correlation(),
+            })
+        columns[column] = info
+    return {
+        "rows": rows,
+        "target": target if target in stats else None,
+        "classes": classes,
+        "seconds": time.perf_counter() - start,
+        "columns": columns,
+    }
+
+
+def class_balance(profile, column):
+    """ {class: rows} of column, from the value counts of the profile (None if the
+    column has too many distinct values to be a target)
+    """
+    if column == profile["target"]:
+        return profile["classes"]
+    return profile["columns"].get(column, {}).get("value_counts")
+
+
+def load_profile(path, target="target"):
+    """ Profile of a file in data/, read from its sidecar if the file did not change
+    since it was profiled (same mtime and size), otherwise profiled and written again
+    """
+    stat = os.stat(path)
+    source = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "target": target}
+    sidecar = sidecar_path(path)
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            profile = json.load(f)
+        if profile.get("source") == source:
+            return profile
+    profile = {**profile_file(path, target), "source": source}
+    tmp = f"{sidecar}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=1)
+    os.replace(tmp, sidecar)
+    return profile
+
+
+def profile_table(profile):
+    """ One row per column, for st.dataframe """
+    rows = []
+    for column, info in profile["columns"].items():
+        rows.append({
+            "column": column,
+            "type": info["dtype"],
+            "missing %": round(info["missing_pct"], 2),
+            "distinct": str(info["distinct"]) if info["distinct_exact"] else f">{info['distinct']}",
+            "min": info.get("min"),
+            "median": info.get("quantiles", {}).get("0.5"),
+            "max": info.get("max"),
+            "corr with target": info.get("corr_target"),
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import psutil
+
+MODEL_DIR = "models/"
+
+
+class ModelRegistry:
+    """ Loads the pickled pipelines in models/ once and keeps them warm in memory
+
+    Useage:
+        registry = ModelRegistry("models/", max_models=4)
+        model = registry.get("Best_Model.pkl")
+        registry.stats()
+
+    A model is loaded again only when its file changed (mtime or size). Once more
+    than max_models are loaded the least recently used one is evicted.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, max_models=4):
+        self.model_dir = model_dir
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def list_models(self):
+        return sorted(f for f in os.listdir(self.model_dir) if f.endswith(".pkl"))
+
+    def get(self, name):
+        """ Returns the model stored as models/<name>, loading it if needed """
+        path = os.path.join(self.model_dir, name)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None and entry["version"] == version:
+                self._models.move_to_end(name)
+                entry["hits"] += 1
+                return entry["model"]
+
+            model, load_seconds, memory = _load(path)
+            self._models[name] = {
+                "model": model,
+                "version": version,
+                "load_seconds": load_seconds,
+                "memory_mb": memory / 1024 ** 2,
+                "file_mb": stat.st_size / 1024 ** 2,
+                "hits": 0,
+            }
+            self._models.move_to_end(name)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+            return model
+
+    def stats(self):
+        """ Load time, memory and cache hits of every loaded model """
+        with self._lock:
+            return [
+                {"model": name, **{k: v for k, v in entry.items() if k not in ("model", "version")}}
+                for name, entry in self._models.items()
+            ]
+
+    def evict(self, name=None):
+        """ Drops one model (or all of them) from memory """
+        with self._lock:
+            if name is None:
+                self._models.clear()
+            else:
+                self._models.pop(name, None)
+
+
+def _load(path):
+    """ joblib.load with the wall time and the growth of the process memory (RSS)
+    while unpickling
+
+    An estimate: other threads allocating at the same time count too, freed memory
+    the allocator keeps does not. tracemalloc would be exact but it is process-wide
+    (one session stopping it breaks the measurement of another) and makes
+    unpickling several times slower.
+    """
+    process = psutil.Process()
+    before = process.memory_info().rss
+    start = time.perf_counter()
+    model = joblib.load(path)
+    load_seconds = time.perf_counter() - start
+    return model, load_seconds, max(process.memory_info().rss - before, 0)
+
+
+# shared by all pages and sessions of the server process
+registry = ModelRegistry(max_models=int(os.environ.get("SEPSENSE_MAX_MODELS", 4)))
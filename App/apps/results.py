@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+
+RESULT_DIR = os.path.join(os.environ.get("SEPSENSE_CACHE_DIR", ".cache") or ".cache", "results")
+
+
+def config_hash(**config):
+    """ Stable hash of a training configuration (dataset key, model, scaler, split, ...) """
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class ResultStore:
+    """ Finished trainings (fitted pipeline, metrics, confusion matrix, importances),
+    keyed by config_hash
+
+    Results are written to RESULT_DIR so they survive a restart of the app, and the
+    most recently used ones are kept in memory.
+    """
+
+    def __init__(self, result_dir=RESULT_DIR, max_in_memory=16):
+        self.result_dir = result_dir
+        self.max_in_memory = max_in_memory
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.result_dir, f"{key}.joblib")
+
+    def get(self, key):
+        """ Returns the stored result or None """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        if not os.path.exists(self._path(key)):
+            return None
+        result = joblib.load(self._path(key))
+        self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        os.makedirs(self.result_dir, exist_ok=True)
+        joblib.dump(result, self._path(key))
+        self._remember(key, result)
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_in_memory:
+                self._results.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._results:
+                return True
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        with self._lock:
+            self._results.pop(key, None)
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+
+result_store = ResultStore()
@@ -0,0 +1,89 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+TARGET = "target"
+
+
+def _is_parquet(source):
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    return str(name).endswith(".parquet")
+
+
+def iter_chunks(source, chunksize=50_000, columns=None):
+    """ Yields the rows of a csv or parquet file (path or file object) as DataFrames
+    of at most chunksize rows, so the whole file is never held in memory.
+
+    source may also be an iterable of DataFrames, e.g. FeatureStore.iter_frames
+    """
+    if not isinstance(source, (str, os.PathLike)) and not hasattr(source, "read"):
+        for chunk in source:
+            yield chunk if columns is None else chunk[columns]
+    elif _is_parquet(source):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize, usecols=columns)
+
+
+def feature_columns(model, columns, id_column=None):
+    """ The columns the model was trained on, in training order.
+
+    Pipelines fitted on a DataFrame remember them (feature_names_in_), for older
+    models all columns except the target and id_column are used, like on the
+    inference page. Raises ValueError if that is not the number of features the
+    model was trained with.
+    """
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None:
+        return list(names)
+    features = [col for col in columns if col not in (TARGET, id_column)]
+    n_features = getattr(model, "n_features_in_", None)
+    if n_features is not None and n_features != len(features):
+        raise ValueError(f"the model was trained on {n_features} features but the data has {len(features)} "
+                         f"columns besides {TARGET!r} and the id column: {features}")
+    return features
+
+
+def score_chunks(model, source, chunksize=50_000, id_column=None):
+    """ inputs:
+            model: fitted pipeline with predict_proba
+            source: csv or parquet file (path or file object) or DataFrame chunks
+            id_column: optional column copied to the output, e.g. a patient id
+
+        outputs:
+            generator of DataFrames with [id_column,] sepsis_probability
+    """
+    features = None
+    for chunk in iter_chunks(source, chunksize):
+        if features is None:
+            features = feature_columns(model, chunk.columns, id_column)
+        X = chunk[features]
+        if getattr(model, "feature_names_in_", None) is None:
+            X = X.to_numpy()
+        out = pd.DataFrame(index=chunk.index)
+        if id_column is not None:
+            out[id_column] = chunk[id_column]
+        out["sepsis_probability"] = np.asarray(model.predict_proba(X))[:, 1]
+        yield out
+
+
+def score_file(model, source, output, chunksize=50_000, id_column=None):
+    """ Scores source chunk by chunk and appends the probabilities to output (csv path
+    or text buffer).
+
+    returns: dict with rows, seconds and rows_per_s
+    """
+    start = time.perf_counter()
+    rows = 0
+    first = True
+    for out in score_chunks(model, source, chunksize, id_column):
+        out.to_csv(output, mode="w" if first else "a", header=first, index=False)
+        first = False
+        rows += len(out)
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds, "rows_per_s": rows / max(seconds, 1e-9)}
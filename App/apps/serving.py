@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import numpy as np
+import pandas as pd
+
+
+class MicroBatcher:
+    """ Coalesces concurrent predict requests into one predict_proba call
+
+    Useage:
+        batcher = MicroBatcher(model, features, max_batch_size=64, max_wait_ms=5, sla_ms=100)
+        probabilities = batcher.predict([{"temp_celsius": 38.2, ...}])
+        batcher.stats()
+
+    A background thread takes the first waiting request and collects more for at most
+    max_wait_ms (or until max_batch_size rows), then scores them together. Requests
+    that already waited longer than sla_ms are rejected with a TimeoutError instead of
+    being scored late.
+    """
+
+    def __init__(self, model, features, max_batch_size=64, max_wait_ms=5, sla_ms=100, history=10_000):
+        self.model = model
+        self.features = list(features)
+        self.max_batch_size = max_batch_size
+        self.max_wait = min(max_wait_ms, sla_ms / 2) / 1000
+        self.sla = sla_ms / 1000
+        self._queue = queue.Queue()
+        self._latencies = deque(maxlen=history)
+        self._batch_sizes = deque(maxlen=history)
+        self._counts = {"requests": 0, "rejected": 0, "batches": 0}
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def rows(self, instances):
+        """ Checks the instances of one request before it joins a batch, so a malformed
+        request fails on its own instead of failing every request scored with it
+
+        returns: float array of shape (len(instances), len(features)), raises ValueError
+            for missing or unknown features, wrong row lengths and non-numeric values
+        """
+        if not isinstance(instances, list):
+            raise ValueError("instances must be a list of dicts or lists of values")
+        X = np.empty((len(instances), len(self.features)))
+        for i, instance in enumerate(instances):
+            if isinstance(instance, dict):
+                missing = [feature for feature in self.features if feature not in instance]
+                unknown = [key for key in instance if key not in self.features]
+                if missing or unknown:
+                    raise ValueError(f"instance {i}: missing features {missing}, unknown features {unknown}")
+                instance = [instance[feature] for feature in self.features]
+            elif not isinstance(instance, (list, tuple)) or len(instance) != len(self.features):
+                raise ValueError(f"instance {i}: expected {len(self.features)} values in the order {self.features}")
+            try:
+                X[i] = [float(value) for value in instance]
+            except (TypeError, ValueError):
+                raise ValueError(f"instance {i}: all values must be numbers") from None
+        return X
+
+    def predict(self, instances):
+        """ instances: list of dicts (feature -> value) or lists of values in feature order
+
+        returns: list of sepsis probabilities, raises ValueError for malformed instances
+            (see rows) and TimeoutError if the SLA is missed
+        """
+        X = self.rows(instances)
+        if not len(X):
+            return []
+        future = Future()
+        arrival = time.perf_counter()
+        self._queue.put((arrival, X, future))
+        try:
+            result = future.result(timeout=self.sla)
+        except (TimeoutError, FutureTimeoutError):
+            future.cancel()
+            with self._lock:
+                self._counts["rejected"] += 1
+            raise TimeoutError(f"latency SLA of {self.sla * 1000:.0f}ms exceeded") from None
+        with self._lock:
+            self._counts["requests"] += 1
+            self._latencies.append(time.perf_counter() - arrival)
+        return result
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            n_rows = len(batch[0][1])
+            deadline = batch[0][0] + self.max_wait
+            while n_rows < self.max_batch_size:
+                # take everything that queued up while the last batch was scored, then
+                # wait for more until the window of the oldest request closes
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    timeout = deadline - time.perf_counter()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                batch.append(item)
+                n_rows += len(item[1])
+            self._score(batch)
+
+    def _score(self, batch):
+        now = time.perf_counter()
+        live = []
+        for arrival, instances, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue  # the caller already gave up
+            if now - arrival > self.sla:
+                future.set_exception(TimeoutError("latency SLA exceeded before scoring"))
+            else:
+                live.append((instances, future))
+        if not live:
+            return
+
+        # the rows were checked in predict, so they stack into one matrix
+        X = np.vstack([instances for instances, _ in live])
+        try:
+            if getattr(self.model, "feature_names_in_", None) is not None:
+                X = pd.DataFrame(X, columns=self.features)
+            probabilities = np.asarray(self.model.predict_proba(X))[:, 1].tolist()
+        except Exception as error:
+            for _, future in live:
+                future.set_exception(error)
+            return
+
+        start = 0
+        for instances, future in live:
+            future.set_result(probabilities[start:start + len(instances)])
+            start += len(instances)
+        with self._lock:
+            self._counts["batches"] += 1
+            self._batch_sizes.append(len(X))
+
+    def stats(self):
+        """ p50/p95/p99 latency in ms over the last requests, request counts and mean batch size """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            batch_sizes = list(self._batch_sizes)
+            stats = dict(self._counts)
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            stats.update({"p50_ms": p50, "p95_ms": p95, "p99_ms": p99})
+        stats["mean_batch_size"] = float(np.mean(batch_sizes)) if batch_sizes else 0.0
+        stats["sla_ms"] = self.sla * 1000
+        return stats
@@ -1,5 +1,9 @@
+import importlib
+
 import streamlit as st
 
+from apps.diagnostics import diagnostics_options, diagnostics_panel, page_run, stage
+
 
 class MultiApp:
     """ Class to add multiple streamlit applications together to create
@@ -14,6 +18,7 @@ class MultiApp:
         app = MultiApp()
         app.add_app("Foo", foo)
         add.add_app("Bar", bar)
+        app.add_app("Model", "apps.model")  # imported when the page is first opened
 
         app.run()
 
@@ -26,7 +31,10 @@ class MultiApp:
     def add_app(self, title, func):
         """ Adds a new app 
         Params:
-            func: the python function to render this app 
+            func: the python function to render this app, or the name of a module
+                with an app() function, e.g. "apps.model". A module is only imported
+                when its page is selected, so its heavy dependencies (sklearn,
+                xgboost, matplotlib, ...) do not slow down the other pages
 
             title:
                 the title of the app. This is what will appear in the dropdown
@@ -37,8 +45,23 @@ class MultiApp:
             "function": func
             })
 
+    @staticmethod
+    def load(app):
+        """ The render function of an app, importing its module on first use.
+        Python keeps imported modules in sys.modules, so later reruns do not import again.
+        """
+        if isinstance(app["function"], str):
+            return importlib.import_module(app["function"]).app
+        return app["function"]
+
     def run(self):
         app = st.selectbox('Navigation',
                            self.apps,
                            format_func=lambda app: app['title'])
-        app['function']()
+        # every render is timed (see apps.diagnostics), the pages add their own stages
+        options = diagnostics_options()
+        with page_run(app['title'], **options) as run:
+            with stage("import"):
+                function = self.load(app)
+            function()
+        diagnostics_panel(run)
@@ -0,0 +1,43 @@
+""" Headless batch scoring
+
+Useage:
+    python score.py Best_Model.pkl data/neonatal.csv -o predictions.csv
+    python score.py pipe.pkl ward.parquet --chunksize 100000 --id-column patient_id
+    python score.py pipe.pkl neonatal --from-store     # memory-mapped feature store dataset
+    python score.py pipe.pkl physionet --from-store --id-column Patient_ID
+"""
+import argparse
+
+from sepsense.feature_store import feature_store
+from apps.registry import registry
+from apps.scoring import score_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a csv or parquet file with a model from models/")
+    parser.add_argument("model", help="file name of the model in models/")
+    parser.add_argument("input", help="csv or parquet file to score (dataset name with --from-store)")
+    parser.add_argument("-o", "--output", default="predictions.csv", help="csv file for the probabilities")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="rows scored at once")
+    parser.add_argument("--id-column", default=None, help="column copied to the output next to the probability "
+                        "(with --from-store an ID column stored with ids=[...])")
+    parser.add_argument("--from-store", action="store_true", help="read the input from the feature store")
+    parser.add_argument("--version", default=None, help="feature store version (default: latest)")
+    args = parser.parse_args()
+
+    model = registry.get(args.model)
+    source = args.input
+    if args.from_store:
+        ids = [args.id_column] if args.id_column else []
+        stored = feature_store.meta(args.input, args.version)["ids"]
+        if args.id_column and args.id_column not in stored:
+            parser.error(f"--id-column {args.id_column} is not an ID column of {args.input} in the feature store "
+                         f"(stored: {', '.join(stored) or 'none'})")
+        source = feature_store.iter_frames(args.input, args.chunksize, args.version, ids=ids)
+    stats = score_file(model, source, args.output, args.chunksize, args.id_column)
+    print(f"scored {stats['rows']} rows in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_s']:.0f} rows/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+""" Local HTTP/JSON scoring service
+
+Useage:
+    python serve.py Best_Model.pkl --data data/neonatal.csv --port 8502 --sla-ms 100
+
+    POST /predict  {"instances": [{"temp_celsius": 38.2, ...}, ...]}  -> {"probabilities": [...]}
+    GET  /stats    latency percentiles (p50/p95/p99), request counts, mean batch size
+    GET  /health
+
+Concurrent requests are scored together in micro-batches, see apps/serving.MicroBatcher.
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from apps.registry import registry
+from apps.scoring import feature_columns
+from apps.serving import MicroBatcher
+
+
+def make_handler(batcher):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "features": batcher.features})
+            elif self.path == "/stats":
+                self._send(200, batcher.stats())
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send(404, {"error": f"unknown path {self.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                instances = body["instances"] if isinstance(body, dict) and "instances" in body else [body]
+            except (ValueError, KeyError) as error:
+                self._send(400, {"error": f"invalid request: {error}"})
+                return
+            try:
+                self._send(200, {"probabilities": batcher.predict(instances)})
+            except ValueError as error:
+                # malformed instances, checked before the request joins a batch
+                self._send(400, {"error": str(error)})
+            except TimeoutError as error:
+                self._send(503, {"error": str(error)})
+            except Exception as error:
+                self._send(500, {"error": str(error)})
+
+        def log_message(self, format, *args):
+            pass  # one line per request would dominate the latency
+
+    return ScoringHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a model from models/ over HTTP")
+    parser.add_argument("model", help="file name of the model in models/")
+    parser.add_argument("--data", default=None,
+                        help="training csv, only needed for the column order of models without feature names")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--sla-ms", type=float, default=100, help="requests slower than this get a 503")
+    args = parser.parse_args()
+
+    model = registry.get(args.model)
+    columns = pd.read_csv(args.data, nrows=0).columns if args.data else []
+    features = feature_columns(model, columns)
+    if not features:
+        parser.error("the model has no feature names, pass --data with the training csv")
+
+    batcher = MicroBatcher(model, features, args.max_batch_size, args.max_wait_ms, args.sla_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher))
+    print(f"serving {args.model} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(batcher.stats(), indent=1))
+
+
+if __name__ == "__main__":
+    main()
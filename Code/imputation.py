@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.impute import SimpleImputer
+from sklearn.neighbors import NearestNeighbors
+
+IMPUTATION_METHODS = ["ffill", "knn", "median"]
+
+
+def forward_fill_patients(df, columns, group="Patient_ID", order="ICULOS"):
+    """ Last observation carried forward innerhalb jedes Patienten
+
+    Params:
+        df: stündliche Messungen mit group und order Spalte
+        columns: Spalten die aufgefüllt werden
+        group: Patienten-Spalte, es wird nie über Patientengrenzen aufgefüllt
+        order: Zeit-Spalte, nach der innerhalb eines Patienten sortiert wird
+
+    returns: DataFrame mit den aufgefüllten columns in der Zeilenreihenfolge von df.
+        Werte vor der ersten Messung eines Patienten bleiben NaN (siehe make_imputer).
+
+    Benutzt nur frühere Stunden desselben Patienten und nie das Label, kann also vor
+    dem Train/Test Split auf alle Daten angewendet werden.
+    """
+    keys = df[[group, order]] if order in df.columns else df[[group]]
+    # stabile Sortierung, damit gleiche Zeitpunkte ihre Reihenfolge behalten
+    sort_order = np.lexsort([keys[col].to_numpy() for col in reversed(keys.columns)])
+    ordered = df[columns].iloc[sort_order]
+    filled = ordered.groupby(df[group].to_numpy()[sort_order], sort=False).ffill()
+    return filled.iloc[np.argsort(sort_order)]
+
+
+class ChunkedKNNImputer(BaseEstimator, TransformerMixin):
+    """ Approximative KNN Imputation mit KD-Tree Index
+
+    Der KNNImputer berechnet für jede zu füllende Zeile die nan_euclidean Distanz zu
+    allen Trainingszeilen, die Laufzeit wächst also mit Trainingszeilen x Testzeilen.
+    Hier wird pro Fehlmuster (welche Spalten fehlen) ein KD-Tree über die beobachteten
+    Spalten der Trainingszeilen aufgebaut und wiederverwendet. Gefüllt wird mit dem
+    Mittel der n_neighbors nächsten Kandidaten, in denen die Spalte gemessen ist.
+    Fehlende Werte der Trainingszeilen zählen mit dem Spaltenmittel in die Distanz
+    und es werden nur n_candidates Kandidaten betrachtet, darum approximativ.
+
+    Params:
+        n_neighbors: wie beim KNNImputer
+        n_candidates: Kandidaten pro Zeile aus dem KD-Tree
+        max_fit_rows: Grösse der Zufallsstichprobe der Trainingszeilen für den Index
+        chunk_size: Zeilen pro Block in transform
+        n_jobs: parallele Blöcke (joblib Threads, -1 = alle Kerne)
+    """
+
+    def __init__(self, n_neighbors=5, n_candidates=20, max_fit_rows=20_000, chunk_size=50_000, n_jobs=-1,
+                 random_state=42):
+        self.n_neighbors = n_neighbors
+        self.n_candidates = n_candidates
+        self.max_fit_rows = max_fit_rows
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        if hasattr(X, "columns"):
+            # wie bei den sklearn Imputern, damit eine Pipeline ihre Spalten kennt
+            self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) > self.max_fit_rows:
+            rows = np.random.default_rng(self.random_state).choice(len(X), self.max_fit_rows, replace=False)
+            X = X[np.sort(rows)]
+        self.reference_ = X
+        # komplett leere Spalten (z.B. EtCO2) werden mit 0 gefüllt statt verworfen
+        counts = (~np.isnan(X)).sum(axis=0)
+        self.fill_ = np.where(counts > 0, np.nansum(X, axis=0) / np.maximum(counts, 1), 0.0)
+        self.filled_reference_ = np.where(np.isnan(X), self.fill_, X)
+        self.indexes_ = {}
+        return self
+
+    def _index(self, observed):
+        key = observed.tobytes()
+        if key not in self.indexes_:
+            index = NearestNeighbors(n_neighbors=min(self.n_candidates, len(self.reference_)), algorithm="kd_tree")
+            self.indexes_[key] = index.fit(self.filled_reference_[:, observed])
+        return self.indexes_[key]
+
+    def _transform_chunk(self, X):
+        X = X.copy()
+        missing = np.isnan(X)
+        patterns, inverse = np.unique(missing, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        for p, pattern in enumerate(patterns):
+            if not pattern.any():
+                continue
+            rows = np.flatnonzero(inverse == p)
+            columns = np.flatnonzero(pattern)
+            if pattern.all():
+                X[np.ix_(rows, columns)] = self.fill_[columns]
+                continue
+            _, candidates = self._index(~pattern).kneighbors(X[np.ix_(rows, ~pattern)])
+            # rows x candidates x fehlende Spalten, die ersten n_neighbors gemessenen zählen
+            values = self.reference_[candidates][:, :, columns]
+            measured = ~np.isnan(values)
+            use = measured & (np.cumsum(measured, axis=1) <= self.n_neighbors)
+            n_used = use.sum(axis=1)
+            means = np.where(use, values, 0).sum(axis=1) / np.maximum(n_used, 1)
+            X[np.ix_(rows, columns)] = np.where(n_used > 0, means, self.fill_[columns])
+        return X
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        # Indizes vorab bauen, damit die Threads den Cache nur lesen
+        for pattern in np.unique(np.isnan(X), axis=0):
+            if pattern.any() and not pattern.all():
+                self._index(~pattern)
+        chunks = Parallel(n_jobs=self.n_jobs, prefer="threads")(
+            delayed(self._transform_chunk)(X[start:start + self.chunk_size])
+            for start in range(0, len(X), self.chunk_size)
+        )
+        return np.vstack(chunks) if chunks else X
+
+
+def make_imputer(method):
+    """ Imputer für die Schritte nach dem Split (fit auf Train, transform auf Test)
+
+    - "ffill": Median für die Werte die forward_fill_patients nicht füllen konnte
+    - "knn": ChunkedKNNImputer
+    - "median": Median je Spalte
+    """
+    if method in ("ffill", "median"):
+        return SimpleImputer(strategy="median", keep_empty_features=True)
+    if method == "knn":
+        return ChunkedKNNImputer(n_neighbors=5)
+    raise ValueError(f"unknown imputation method {method!r}, use one of {IMPUTATION_METHODS}")
@@ -1,35 +1,311 @@
+import hashlib
+import json
 import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-def convert_psv_to_csv(input_folder, output_file):
+
+def _list_psv_files(input_folder):
+    return [filename for filename in os.listdir(input_folder) if filename.endswith('.psv')]
+
+
+def _chunks(items, chunk_size):
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def _convert_chunk(args):
+    """ Worker: schreibt einen Block von .psv Dateien in eine Shard-Datei (ohne Header)
+
+    returns: (shard_path, header, n_files, n_rows)
+    """
+    input_folder, filenames, shard_path = args
+    header = None
+    n_rows = 0
+    with open(shard_path, 'w') as out_csv:
+        for filename in filenames:
+            patient_id = filename.rsplit('.', 1)[0]
+            with open(os.path.join(input_folder, filename), 'r') as in_psv:
+                file_header = in_psv.readline().strip()
+                if header is None:
+                    header = file_header
+                for line in in_psv:
+                    out_csv.write(f"{patient_id},{line.replace('|', ',')}")
+                    n_rows += 1
+    return shard_path, header, len(filenames), n_rows
+
+
+def _report(input_folder, output_file, n_files, n_rows, seconds):
+    seconds = max(seconds, 1e-9)
+    print(f"Dateien aus {input_folder} wurden in {output_file} kombiniert.")
+    print(f"{n_files} Dateien, {n_rows} Zeilen in {seconds:.2f}s "
+          f"({n_files / seconds:.1f} files/s, {n_rows / seconds:.1f} rows/s)")
+    return {"files": n_files, "rows": n_rows, "seconds": seconds,
+            "files_per_s": n_files / seconds, "rows_per_s": n_rows / seconds}
+
+
+def convert_psv_to_csv(input_folder, output_file, workers=1, chunk_size=500, incremental=False):
+    """ Kombiniert alle .psv Patientendateien eines Ordners in eine CSV mit Patient_ID Spalte
+
+    Params:
+        workers: Anzahl Prozesse. Bei workers > 1 werden die Dateien in Blöcken von
+            chunk_size Dateien parallel in Shards geparst und der Reihe nach in die
+            Ausgabedatei kopiert, es liegen also nie mehr als die Shards im Speicher.
+        chunk_size: Anzahl Dateien pro Block
+        incremental: nur neue/geänderte Dateien konvertieren. Dafür wird neben der
+            Ausgabe ein Manifest (<output_file>.manifest.json) mit mtime, Grösse und
+            Hash jeder Datei geführt. Zeilen geänderter oder gelöschter Patienten werden
+            ersetzt bzw. entfernt, neue Patienten angehängt.
+
+    returns: dict mit files, rows, seconds, files_per_s, rows_per_s
+    """
+    start = time.perf_counter()
+    filenames = _list_psv_files(input_folder)
+    manifest_path = _manifest_path(output_file)
+    previous = _load_manifest(manifest_path) if os.path.exists(output_file) else {}
+    manifest = _scan_files(input_folder, filenames, previous)
+
+    if incremental and previous:
+        n_files, n_rows = _update_incremental(input_folder, output_file, manifest, previous, workers, chunk_size)
+    else:
+        n_files, n_rows = _convert_files(input_folder, filenames, output_file, workers, chunk_size)
+    _save_manifest(manifest_path, manifest)
+    return _report(input_folder, output_file, n_files, n_rows, time.perf_counter() - start)
+
+
+def _convert_files(input_folder, filenames, output_file, workers, chunk_size, append=False):
+    if workers > 1 or append:
+        return _convert_parallel(input_folder, filenames, output_file, workers, chunk_size, append)
+
+    n_rows = 0
     with open(output_file, 'w') as out_csv:
         first_file = True
-        for filename in os.listdir(input_folder):
-            if filename.endswith('.psv'):
-                patient_id = filename.rsplit('.', 1)[0]  # Entferne die .psv-Endung
-                with open(os.path.join(input_folder, filename), 'r') as in_psv:
-                    # Wenn es die erste Datei ist, schreibe den Header in die CSV
-                    if first_file:
-                        header = in_psv.readline().strip()
-                        out_csv.write(f"Patient_ID,{header.replace('|', ',')}\n")
-                        first_file = False
-                    else:
-                        # Überspringe den Header für nachfolgende Dateien
-                        in_psv.readline()
-                    
-                    # Schreibe den Rest der Datei in die CSV, füge Patient_ID hinzu
-                    for line in in_psv:
-                        out_csv.write(f"{patient_id},{line.replace('|', ',')}")
+        for filename in filenames:
+            patient_id = filename.rsplit('.', 1)[0]  # Entferne die .psv-Endung
+            with open(os.path.join(input_folder, filename), 'r') as in_psv:
+                # Wenn es die erste Datei ist, schreibe den Header in die CSV
+                if first_file:
+                    header = in_psv.readline().strip()
+                    out_csv.write(f"Patient_ID,{header.replace('|', ',')}\n")
+                    first_file = False
+                else:
+                    # Überspringe den Header für nachfolgende Dateien
+                    in_psv.readline()
+
+                # Schreibe den Rest der Datei in die CSV, füge Patient_ID hinzu
+                for line in in_psv:
+                    out_csv.write(f"{patient_id},{line.replace('|', ',')}")
+                    n_rows += 1
+    return len(filenames), n_rows
+
+
+def _convert_parallel(input_folder, filenames, output_file, workers, chunk_size, append=False):
+    shard_dir = tempfile.mkdtemp(prefix="psv_shards_", dir=os.path.dirname(os.path.abspath(output_file)))
+    jobs = [
+        (input_folder, chunk, os.path.join(shard_dir, f"shard_{i:06d}.csv"))
+        for i, chunk in enumerate(_chunks(filenames, chunk_size))
+    ]
+    n_files = 0
+    n_rows = 0
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        with open(output_file, 'a' if append else 'w') as out_csv:
+            first_shard = not append
+            # map liefert die Shards in der Reihenfolge der Dateien, die Ausgabe ist also
+            # identisch zur seriellen Variante
+            results = pool.map(_convert_chunk, jobs) if pool else map(_convert_chunk, jobs)
+            for shard_path, header, shard_files, shard_rows in results:
+                if first_shard and header is not None:
+                    out_csv.write(f"Patient_ID,{header.replace('|', ',')}\n")
+                    first_shard = False
+                with open(shard_path, 'r') as shard:
+                    shutil.copyfileobj(shard, out_csv, 1024 * 1024)
+                os.remove(shard_path)
+                n_files += shard_files
+                n_rows += shard_rows
+    finally:
+        if pool:
+            pool.shutdown()
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    return n_files, n_rows
+
+
+def _manifest_path(output_file):
+    return f"{output_file}.manifest.json"
+
+
+def _load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as f:
+        return json.load(f)["files"]
+
+
+def _save_manifest(manifest_path, manifest):
+    with open(manifest_path, 'w') as f:
+        json.dump({"files": manifest}, f, indent=1)
+
+
+def _file_hash(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _scan_files(input_folder, filenames, previous):
+    """ mtime, Grösse und Hash pro Datei. Der Hash wird nur neu berechnet, wenn sich
+    mtime oder Grösse gegenüber dem alten Manifest geändert haben.
+    """
+    manifest = {}
+    for filename in filenames:
+        stat = os.stat(os.path.join(input_folder, filename))
+        entry = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+        old = previous.get(filename)
+        if old and old["mtime"] == entry["mtime"] and old["size"] == entry["size"]:
+            entry["sha1"] = old["sha1"]
+        else:
+            entry["sha1"] = _file_hash(os.path.join(input_folder, filename))
+        manifest[filename] = entry
+    return manifest
+
+
+def _update_incremental(input_folder, output_file, manifest, previous, workers, chunk_size):
+    new = [f for f in manifest if f not in previous]
+    changed = [f for f in manifest if f in previous and manifest[f]["sha1"] != previous[f]["sha1"]]
+    removed = [f for f in previous if f not in manifest]
+    print(f"Inkrementell: {len(new)} neu, {len(changed)} geändert, {len(removed)} entfernt")
+
+    stale_ids = {f.rsplit('.', 1)[0] for f in changed + removed}
+    if stale_ids:
+        _drop_patients(output_file, stale_ids)
+    if not new and not changed:
+        return 0, 0
+    return _convert_files(input_folder, new + changed, output_file, workers, chunk_size, append=True)
+
+
+def _drop_patients(output_file, patient_ids):
+    """ Entfernt alle Zeilen der angegebenen Patienten aus der CSV (zeilenweise, ohne sie zu parsen) """
+    tmp_file = f"{output_file}.tmp"
+    with open(output_file, 'r') as in_csv, open(tmp_file, 'w') as out_csv:
+        out_csv.write(in_csv.readline())
+        for line in in_csv:
+            if line.split(',', 1)[0] not in patient_ids:
+                out_csv.write(line)
+    os.replace(tmp_file, output_file)
+
+
+# Explizites Schema für die Columnar-Ausgabe, alle übrigen Spalten werden float32
+PHYSIONET_INT_COLUMNS = {"Gender": "int8", "ICULOS": "int16", "SepsisLabel": "int8"}
+COLUMNAR_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def physionet_schema(columns):
+    """ pyarrow Schema für die PhysioNet Spalten: Patient_ID kategorisch, Vitalwerte float32 """
+    import pyarrow as pa
+
+    fields = [pa.field("Patient_ID", pa.dictionary(pa.int32(), pa.string()))]
+    for col in columns:
+        dtype = PHYSIONET_INT_COLUMNS.get(col, "float32")
+        fields.append(pa.field(col, pa.from_numpy_dtype(dtype)))
+    return pa.schema(fields)
+
+
+def _convert_chunk_columnar(args):
+    """ Worker: schreibt einen Block von .psv Dateien als eine Partition (Parquet oder Arrow IPC)
+
+    returns: (part_path, n_files, n_rows)
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+
+    input_folder, filenames, part_path, fmt = args
+    frames = []
+    for filename in filenames:
+        patient_id = filename.rsplit('.', 1)[0]
+        df = pd.read_csv(os.path.join(input_folder, filename), sep='|', dtype="float32")
+        df.insert(0, "Patient_ID", patient_id)
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    df["Patient_ID"] = df["Patient_ID"].astype("category")
+    schema = physionet_schema(df.columns[1:])
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    if fmt == "parquet":
+        pq.write_table(table, part_path)
+    else:
+        feather.write_feather(table, part_path, compression="uncompressed")
+    return part_path, len(filenames), len(df)
+
+
+def convert_psv_to_columnar(input_folder, output_dir, fmt="parquet", workers=1, chunk_size=500):
+    """ Wie convert_psv_to_csv, schreibt aber ein partitioniertes Parquet/Arrow Dataset
+
+    Jede Partition output_dir/part-XXXXXX.<fmt> enthält ganze Patienten mit dem Schema
+    aus physionet_schema. Laden mit load_columnar.
+
+    Params:
+        fmt: "parquet" oder "arrow" (Arrow IPC, unkomprimiert und memory-mappable)
+    """
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"fmt must be one of {list(COLUMNAR_FORMATS)}, got {fmt!r}")
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    for old_part in os.listdir(output_dir):
+        if old_part.startswith("part-"):
+            os.remove(os.path.join(output_dir, old_part))
+
+    filenames = _list_psv_files(input_folder)
+    jobs = [
+        (input_folder, chunk, os.path.join(output_dir, f"part-{i:06d}{COLUMNAR_FORMATS[fmt]}"), fmt)
+        for i, chunk in enumerate(_chunks(filenames, chunk_size))
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_convert_chunk_columnar, jobs))
+    else:
+        results = [_convert_chunk_columnar(job) for job in jobs]
+
+    n_files = sum(result[1] for result in results)
+    n_rows = sum(result[2] for result in results)
+    return _report(input_folder, output_dir, n_files, n_rows, time.perf_counter() - start)
+
+
+def load_columnar(path, columns=None):
+    """ Lädt ein mit convert_psv_to_columnar geschriebenes Dataset als DataFrame
+
+    Es werden nur die angegebenen Spalten gelesen, die Dateien werden memory-mapped.
+    Patient_ID kommt als category zurück.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    parts = sorted(os.listdir(path))
+    if any(part.endswith(".arrow") for part in parts):
+        tables = [
+            feather.read_table(os.path.join(path, part), columns=columns, memory_map=True)
+            for part in parts if part.endswith(".arrow")
+        ]
+        table = pa.concat_tables(tables)
+    else:
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas()
 
-    print(f"Dateien aus {input_folder} wurden in {output_file} kombiniert.")
 
 def main():
     folder1_path = './Data/training/'
     folder2_path = './Data/training_setB/'
     output_csv1 = 'folder1_data.csv'
     output_csv2 = 'folder2_data.csv'
+    workers = os.cpu_count() or 1
 
-    convert_psv_to_csv(folder1_path, output_csv1)
-    convert_psv_to_csv(folder2_path, output_csv2)
+    convert_psv_to_csv(folder1_path, output_csv1, workers=workers, incremental=True)
+    convert_psv_to_csv(folder2_path, output_csv2, workers=workers, incremental=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,174 @@
+""" Online-Scoring stündlicher Vitalwerte pro Patient
+
+Useage:
+    python streaming.py mein_modell.pkl ../Data/training_setA
+"""
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from timeseries_features import VITALS, WINDOWS, feature_names, window_stats
+
+
+class PatientState:
+    """ Kompakter Zustand eines Patienten: Ringpuffer über die letzten max(windows)
+    Stunden plus letzte Messung je Vitalwert. Die Arbeit pro neuer Stunde hängt nur
+    von der Fenstergrösse ab, nicht von der Länge des Aufenthalts (O(1)).
+    """
+
+    __slots__ = ("rows", "ring", "last_value", "last_hour")
+
+    def __init__(self, n_vitals, max_window):
+        self.rows = 0
+        self.ring = np.full((max_window, n_vitals), np.nan)
+        self.last_value = np.full(n_vitals, np.nan)
+        self.last_hour = np.full(n_vitals, np.nan)
+
+
+class StreamingScorer:
+    """ Aktualisiert die Features von timeseries_features pro neuer Stunde eines
+    Patienten und liefert die neue Sepsis-Wahrscheinlichkeit
+
+    Useage:
+        scorer = load_scorer("mein_modell.pkl")
+        p = scorer.update("p000001", {"ICULOS": 1, "HR": 80, "Age": 65, "Gender": 1})
+
+    Params:
+        model: Pipeline (Imputer + Modell) mit predict_proba, trainiert auf einem
+            DataFrame mit keep + feature_names(vitals, windows), wie test.py mit
+            zeitreihen_features sie speichert
+        keep: statische Spalten vor den Zeitreihen-Features
+
+    Die Spalten werden über die Spaltennamen des Modells zugeordnet. Ein Modell ohne
+    Spaltennamen (feature_names_in_) wird abgelehnt, weil eine andere Reihenfolge der
+    Vitalwerte sonst unbemerkt falsche Wahrscheinlichkeiten liefert.
+
+    Die Features stimmen mit timeseries_features überein, solange die Stunden eines
+    Patienten in der richtigen Reihenfolge ankommen.
+    """
+
+    def __init__(self, model, vitals=VITALS, windows=WINDOWS, keep=("Age", "Gender")):
+        self.model = model
+        self.vitals = list(vitals)
+        self.windows = np.asarray(windows)
+        self.keep = list(keep)
+        self.max_window = int(self.windows.max())
+        self.columns = self.keep + feature_names(vitals, windows)
+        self.patients = {}
+        names = getattr(model, "feature_names_in_", None)
+        if names is None:
+            raise ValueError("Das Modell hat keine Spaltennamen (feature_names_in_), die Spalten können "
+                             "nicht zugeordnet werden. Modell mit test.py als Pipeline speichern.")
+        self.model_columns = list(names)
+        missing = [col for col in self.model_columns if col not in self.columns]
+        if missing:
+            raise ValueError(f"Spalten des Modells fehlen in den Streaming-Features: {missing}")
+
+    def features(self, patient_id, record):
+        """ Nimmt eine neue Stunde (dict Spalte -> Wert, mit ICULOS) in den Zustand
+        auf und gibt den Feature-Vektor in der Reihenfolge von self.columns zurück
+        """
+        state = self.patients.get(patient_id)
+        if state is None:
+            state = PatientState(len(self.vitals), self.max_window)
+            self.patients[patient_id] = state
+
+        hour = float(record["ICULOS"])
+        values = np.array([record.get(vital, np.nan) for vital in self.vitals], dtype=np.float64)
+        measured = ~np.isnan(values)
+
+        previous_locf = state.last_value if state.rows else np.full(len(self.vitals), np.nan)
+        state.ring[state.rows % self.max_window] = values
+        state.rows += 1
+        state.last_value = np.where(measured, values, state.last_value)
+        state.last_hour = np.where(measured, hour, state.last_hour)
+
+        per_vital = [state.last_value, state.last_value - previous_locf, hour - state.last_hour]
+        for window in self.windows:
+            # die letzten window Stunden in zeitlicher Reihenfolge (vor der Aufnahme NaN)
+            rows = np.arange(state.rows - window, state.rows) % self.max_window
+            per_vital += list(window_stats(np.ascontiguousarray(state.ring[rows].T)))
+        # Reihenfolge wie feature_names: pro Vitalwert alle Features
+        timeseries = np.stack(per_vital, axis=1).ravel()
+        static = [record.get(col, np.nan) for col in self.keep]
+        return np.concatenate([np.asarray(static, dtype=np.float64), timeseries])
+
+    def predict(self, rows):
+        """ Wahrscheinlichkeiten für eine Liste von Feature-Vektoren (ein Modellaufruf) """
+        X = pd.DataFrame(np.vstack(rows).astype(np.float32), columns=self.columns)[self.model_columns]
+        return np.asarray(self.model.predict_proba(X))[:, 1]
+
+    def update(self, patient_id, record):
+        """ Neue Stunde eines Patienten -> aktualisierte Sepsis-Wahrscheinlichkeit """
+        return float(self.predict([self.features(patient_id, record)])[0])
+
+    def discharge(self, patient_id):
+        """ Entfernt den Zustand eines entlassenen Patienten """
+        self.patients.pop(patient_id, None)
+
+
+def load_scorer(model_path):
+    """ StreamingScorer für ein mit test.py (zeitreihen_features) gespeichertes Modell:
+    dict mit der Pipeline und den Vitalwerten, Fenstern und statischen Spalten, mit
+    denen sie trainiert wurde
+    """
+    saved = joblib.load(model_path)
+    if not isinstance(saved, dict) or "vitals" not in saved:
+        raise ValueError(f"{model_path} wurde nicht von test.py mit zeitreihen_features gespeichert")
+    return StreamingScorer(saved["model"], saved["vitals"], saved["windows"], saved["keep"])
+
+
+def replay_psv(scorer, input_folder, batch_by_hour=True):
+    """ Spielt PhysioNet .psv Dateien als stündlichen Feed ab (alle Patienten
+    parallel, Stunde für Stunde)
+
+    Params:
+        batch_by_hour: alle Ereignisse einer Stunde in einem predict_proba Aufruf
+            bewerten, die Features werden trotzdem pro Ereignis aktualisiert
+
+    yields: (patient_id, ICULOS, probability, SepsisLabel)
+    """
+    frames = []
+    for filename in sorted(os.listdir(input_folder)):
+        if filename.endswith(".psv"):
+            df = pd.read_csv(os.path.join(input_folder, filename), sep="|")
+            df.insert(0, "Patient_ID", filename.rsplit(".", 1)[0])
+            frames.append(df)
+    events = pd.concat(frames, ignore_index=True).sort_values("ICULOS", kind="stable")
+
+    for _, hour in events.groupby("ICULOS", sort=True):
+        records = hour.to_dict("records")
+        if batch_by_hour:
+            rows = [scorer.features(record["Patient_ID"], record) for record in records]
+            probabilities = scorer.predict(rows)
+        else:
+            probabilities = [scorer.update(record["Patient_ID"], record) for record in records]
+        for record, probability in zip(records, probabilities):
+            yield record["Patient_ID"], record["ICULOS"], float(probability), record.get("SepsisLabel", np.nan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spielt .psv Dateien durch den StreamingScorer")
+    parser.add_argument("model", help="joblib Modell, trainiert mit zeitreihen_features (test.py)")
+    parser.add_argument("input_folder", help="Ordner mit .psv Dateien")
+    parser.add_argument("-o", "--output", default=None, help="CSV für die Wahrscheinlichkeiten")
+    parser.add_argument("--per-event", action="store_true", help="ein predict_proba Aufruf pro Ereignis")
+    args = parser.parse_args()
+
+    scorer = load_scorer(args.model)
+    start = time.perf_counter()
+    results = list(replay_psv(scorer, args.input_folder, batch_by_hour=not args.per_event))
+    seconds = time.perf_counter() - start
+    print(f"{len(results)} Ereignisse von {len(scorer.patients)} Patienten in {seconds:.2f}s "
+          f"({len(results) / max(seconds, 1e-9):.0f} Ereignisse/s)")
+    if args.output:
+        pd.DataFrame(results, columns=["Patient_ID", "ICULOS", "sepsis_probability", "SepsisLabel"]).to_csv(
+            args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
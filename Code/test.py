@@ -15,8 +15,17 @@ from sklearn.metrics import classification_report, confusion_matrix, roc_auc_sco
 from sklearn.impute import KNNImputer
 import joblib
 from imblearn.under_sampling import RandomUnderSampler
+from sklearn.pipeline import Pipeline
 
-df = pd.read_csv("./Data/Kaggle_Dataset.csv")
+from physionet_to_csv import load_columnar
+from imputation import forward_fill_patients, make_imputer
+from timeseries_features import VITALS, WINDOWS, timeseries_features
+import os
+
+from sepsense.feature_store import feature_store
+
+# Entweder die Kaggle CSV oder ein mit convert_psv_to_columnar geschriebenes Verzeichnis
+data_path = "./Data/Kaggle_Dataset.csv"
 
 list_non_invasive = ["HR", "O2Sat", "Temp", "FiO2", "Age", "Gender", "Resp"]
 
@@ -24,13 +33,42 @@ uebliche_messungen_neonatals = ["SBP", "MAP", "DBP", "EtCO2"]
 
 list_invasive = list_non_invasive + uebliche_messungen_neonatals
 
-df_interesting = df[list_invasive + ["SepsisLabel", "Patient_ID"]]
-
+# Imputation: "ffill" (pro Patient), "knn" (ChunkedKNNImputer) oder "median",
+# Vergleich siehe benchmarks/bench_imputation.py
+imputation = "ffill"
+
+# Zeitreihen-Features pro Patient (LOCF, Delta, Stunden seit Messung, gleitende
+# Mittel) statt jede Stunde als unabhängige Zeile, siehe timeseries_features.py
+zeitreihen_features = True
+
+# Nur die benötigten Spalten laden (Patient_ID und ICULOS für die Zeitreihe)
+columns = list_invasive + ["Patient_ID", "ICULOS", "SepsisLabel"]
+if os.path.isdir(data_path):
+    df = load_columnar(data_path, columns=columns)
+    df_interesting = df[columns]
+    y = df_interesting["SepsisLabel"]  # Zielvariable
+else:
+    # Die CSV wird nur beim ersten Lauf geparst, danach werden X und y aus dem
+    # Feature Store gemappt (gleiche Spaltenreihenfolge, keine Kopie)
+    # Patient_ID ist bei convert_psv_to_csv ein Text ("p000001"), darum als ID-Spalte
+    version = feature_store.build_from_csv("physionet", data_path, target="SepsisLabel", columns=columns[:-1],
+                                           ids=["Patient_ID"])
+    X_store, y_store, meta = feature_store.get("physionet", version)
+    df_interesting = pd.DataFrame(X_store, columns=meta["columns"], copy=False)
+    df_interesting["Patient_ID"] = feature_store.ids("physionet", "Patient_ID", version)[0]
+    y = pd.Series(y_store, name="SepsisLabel", copy=False)  # Zielvariable
 
 # Schritt 2: Daten vorbereiten
-# Angenommen, df ist Ihr DataFrame
-X = df_interesting.drop(columns=["SepsisLabel", "Patient_ID"])  # Merkmale
-y = df_interesting["SepsisLabel"]  # Zielvariable
+if zeitreihen_features:
+    # Reihenfolge von VITALS, wie im StreamingScorer
+    vitals = [col for col in VITALS if col in list_invasive]
+    keep = ["Age", "Gender"]
+    X = timeseries_features(df_interesting, vitals, keep=keep)  # Merkmale
+elif imputation == "ffill":
+    # LOCF nutzt nur frühere Stunden desselben Patienten, daher vor dem Split
+    X = forward_fill_patients(df_interesting, list_invasive)  # Merkmale
+else:
+    X = df_interesting[list_invasive]  # Merkmale
 # Teilen Sie die Daten in Trainings- und Testsets
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
 
@@ -40,7 +78,7 @@ rus = RandomUnderSampler(random_state=42)
 X_train_resampled, y_train_resampled = rus.fit_resample(X_train, y_train)
 
 # Imputation nach dem Sampling
-imputer = KNNImputer(n_neighbors=5)
+imputer = make_imputer(imputation)
 X_train_filled = imputer.fit_transform(X_train_resampled)
 X_test_filled = imputer.transform(X_test)
 
@@ -48,7 +86,12 @@ X_test_filled = imputer.transform(X_test)
 clf = XGBClassifier(objective="binary:logistic", random_state=42)
 clf.fit(X_train_filled, y_train_resampled)
 
-joblib.dump(clf, "mein_modell.pkl")
+# Imputer und Modell zusammen speichern, das Modell allein erwartet gefüllte Werte.
+# Mit den Zeitreihen-Features auch die Parameter für streaming.load_scorer
+modell = {"model": Pipeline([("imputer", imputer), ("model", clf)]), "columns": list(X.columns)}
+if zeitreihen_features:
+    modell.update(vitals=vitals, windows=list(WINDOWS), keep=keep)
+joblib.dump(modell, "mein_modell.pkl")
 
 # Schritt 5: Vorhersagen und Auswertung
 y_pred = clf.predict(X_test_filled)
@@ -0,0 +1,167 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# Stündlich gemessene Vitalwerte der PhysioNet/Kaggle Daten
+VITALS = ["HR", "O2Sat", "Temp", "SBP", "MAP", "DBP", "Resp", "EtCO2", "FiO2"]
+# Fenster der gleitenden Mittel/Standardabweichungen in Stunden
+WINDOWS = (6, 24)
+
+
+def feature_names(vitals=VITALS, windows=WINDOWS):
+    """ Spaltennamen (in Ausgabereihenfolge) von timeseries_features """
+    names = []
+    for vital in vitals:
+        names += [f"{vital}_locf", f"{vital}_delta", f"{vital}_hours_since"]
+        for window in windows:
+            names += [f"{vital}_mean_{window}h", f"{vital}_std_{window}h"]
+    return names
+
+
+def window_stats(windows):
+    """ Mittel und Standardabweichung (ddof=0) über die letzte Achse, NaN = nicht gemessen
+
+    Wird von timeseries_features und vom StreamingScorer benutzt, damit beide exakt
+    gleich rechnen.
+    """
+    measured = ~np.isnan(windows)
+    count = measured.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(measured, windows, 0.0).sum(axis=-1) / count
+        deviations = np.where(measured, windows - mean[..., None], 0.0)
+        std = np.sqrt((deviations ** 2).sum(axis=-1) / count)
+    return mean, std
+
+
+def _windows(column, row_start, window):
+    """ Zeilen x window Matrix der letzten window Werte desselben Patienten (sonst NaN) """
+    padded = np.concatenate([np.full(window - 1, np.nan), column])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    positions = np.arange(len(column))[:, None] - (window - 1) + np.arange(window)
+    return np.where(positions >= row_start[:, None], windows, np.nan)
+
+
+def _features_sorted(patients, hours, values, windows):
+    """ Features für nach (Patient, Stunde) sortierte numpy Arrays
+
+    Params:
+        patients: Patientencodes, gleiche Patienten stehen zusammen
+        hours: ICULOS
+        values: Zeilen x Vitalwerte (NaN = nicht gemessen)
+
+    returns: Liste von Arrays, Reihenfolge wie feature_names
+    """
+    n_rows, n_vitals = values.shape
+    index = np.arange(n_rows)
+    boundaries = np.flatnonzero(patients[1:] != patients[:-1]) + 1
+    starts = np.concatenate([[0], boundaries])
+    lengths = np.diff(np.concatenate([starts, [n_rows]]))
+    row_start = np.repeat(starts, lengths)
+    first_row = index == row_start
+
+    features = []
+    for j in range(n_vitals):
+        column = values[:, j]
+        measured = ~np.isnan(column)
+
+        # Index der letzten Messung bis zur aktuellen Zeile, nur innerhalb des Patienten
+        last = np.maximum.accumulate(np.where(measured, index, -1))
+        seen = last >= row_start
+        last = np.where(seen, last, 0)
+        locf = np.where(seen, column[last], np.nan)
+        hours_since = np.where(seen, hours - hours[last], np.nan)
+
+        previous = np.concatenate([[np.nan], locf[:-1]])
+        delta = np.where(first_row, np.nan, locf - previous)
+
+        vital = [locf, delta, hours_since]
+        for window in windows:
+            vital += list(window_stats(_windows(column, row_start, window)))
+        features.append(vital)
+    return [array for vital in features for array in vital]
+
+
+def timeseries_features(df, vitals=VITALS, windows=WINDOWS, group="Patient_ID", order="ICULOS", keep=()):
+    """ Zeitreihen-Features pro Patient, vektorisiert ohne Python-Schleife über Patienten
+
+    Params:
+        df: stündliche Zeilen mit group, order und den vitals Spalten
+        vitals: Vitalwerte für die Features
+        windows: Fenstergrössen in Stunden (Zeilen) für mean/std
+        keep: Spalten die unverändert übernommen werden (z.B. Age, Gender, SepsisLabel)
+
+    returns: DataFrame mit keep + feature_names(vitals, windows), in der Zeilenreihenfolge
+        und mit dem Index von df
+
+    - locf: letzter gemessener Wert (last observation carried forward)
+    - delta: Änderung des locf Werts zur Vorstunde
+    - hours_since: Stunden seit der letzten Messung
+    - mean_<w>h / std_<w>h: über die Messungen der letzten w Stunden (Fenster als
+      strided View, Speicher Zeilen x w pro Vitalwert)
+    Nichts wird über Patientengrenzen hinweg berechnet.
+    """
+    patients = pd.factorize(df[group])[0]
+    hours = df[order].to_numpy(dtype=np.float64)
+    sort_order = np.lexsort([hours, patients])
+    values = df[list(vitals)].to_numpy(dtype=np.float64)[sort_order]
+
+    arrays = _features_sorted(patients[sort_order], hours[sort_order], values, windows)
+    unsort = np.argsort(sort_order)
+    features = pd.DataFrame(
+        {name: array[unsort].astype(np.float32) for name, array in zip(feature_names(vitals, windows), arrays)},
+        index=df.index,
+    )
+    if keep:
+        features = pd.concat([df[list(keep)], features], axis=1)
+    return features
+
+
+def iter_patient_chunks(csv_path, chunksize=200_000, group="Patient_ID", usecols=None):
+    """ Liest eine CSV in Blöcken, die nur ganze Patienten enthalten
+
+    Die Zeilen eines Patienten müssen zusammenstehen (wie bei convert_psv_to_csv).
+    Die Zeilen des letzten Patienten eines Blocks werden an den nächsten Block gehängt.
+    """
+    rest = None
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, usecols=usecols):
+        if rest is not None:
+            chunk = pd.concat([rest, chunk], ignore_index=True)
+        last_patient = chunk[group].iloc[-1]
+        complete = (chunk[group] != last_patient).to_numpy()
+        # nur ein Patient im Block: weiterlesen
+        if not complete.any():
+            rest = chunk
+            continue
+        cut = len(chunk) - np.argmax(complete[::-1])
+        rest = chunk.iloc[cut:]
+        yield chunk.iloc[:cut]
+    if rest is not None and len(rest):
+        yield rest
+
+
+def build_feature_file(csv_path, output, vitals=VITALS, windows=WINDOWS, keep=("Age", "Gender", "SepsisLabel"),
+                       memory_mb=512, group="Patient_ID", order="ICULOS"):
+    """ Schreibt die Zeitreihen-Features einer PhysioNet CSV in output (CSV)
+
+    Params:
+        memory_mb: ungefähres Speicherbudget, daraus ergibt sich die Blockgrösse
+
+    returns: dict mit rows, seconds und rows_per_s
+    """
+    start = time.perf_counter()
+    # pro Zeile: Eingabe + float64 Zwischenwerte + float32 Ausgabe, grob 16 Byte pro
+    # Feature, dazu die Fenstermatrizen eines Vitalwerts
+    bytes_per_row = 16 * (len(vitals) + len(feature_names(vitals, windows)) + len(keep)) + 64 + 32 * max(windows)
+    chunksize = max(10_000, int(memory_mb * 1024 ** 2 / bytes_per_row / 3))
+    usecols = [group, order] + list(vitals) + [col for col in keep if col not in (group, order)]
+
+    rows = 0
+    first = True
+    for chunk in iter_patient_chunks(csv_path, chunksize, group, usecols):
+        features = timeseries_features(chunk, vitals, windows, group, order, keep=(group, order) + tuple(keep))
+        features.to_csv(output, mode="w" if first else "a", header=first, index=False)
+        first = False
+        rows += len(features)
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds, "rows_per_s": rows / max(seconds, 1e-9)}
@@ -16,29 +16,71 @@ from xgboost import XGBClassifier
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.naive_bayes import GaussianNB
-from sklearn.metrics import accuracy_score
+from sklearn.metrics import accuracy_score, recall_score, roc_auc_score
+from sklearn.pipeline import Pipeline
+from threadpoolctl import threadpool_limits
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
+import os
+import time
 import joblib
+import pathlib
 
+from sepsense.dtypes import optimize_dtypes
+from sepsense.feature_store import feature_store
 
-def train_and_save_model(
-    data_path,
-    model_name="LR",
-    sampling_method=None,
-    split_ratio=0.3,
-    feature_selection_method=None,
-    model_path="saved_model.pkl",
-    number_of_features=5,
-):
-    data = pd.read_csv(data_path)
 
-    # Splitting data
+def make_models():
+    """ Returns a fresh, unfitted instance of every model we compare """
+    return {
+        "LR": LogisticRegression(),
+        "SVM": SVC(),
+        "XGBoost": XGBClassifier(eval_metric="mlogloss"),
+        "RF": RandomForestClassifier(),
+        "DT": DecisionTreeClassifier(),
+        "NB": GaussianNB(),
+    }
+
+
+SAMPLING_METHODS = [None, "RandomUnderSampler", "RandomOverSampler", "Upsampling"]
+FEATURE_SELECTION_METHODS = [None, "SelectKBest", "RFE", "FeatureImportance"]
+
+
+def load_data(data_path, use_feature_store=False):
+    """ returns: (X, y) of the cleaned neonatal csv
+
+    With use_feature_store the csv is parsed only once into the memory-mapped
+    feature store and X/y are read-only views of it on later runs.
+    """
+    if use_feature_store:
+        X, y = load_from_store(*store_data(data_path))
+        print(f"{data_path}: memory-mapped from {feature_store.root}")
+        return X, y
+    data, report = optimize_dtypes(pd.read_csv(data_path))
+    print(f"{data_path}: {report['before_mb']:.1f}MB -> {report['after_mb']:.1f}MB after dtype optimization")
     X = data[data.columns.difference(["sepsis_binary", "sepsis_group"])]
     y = data["sepsis_binary"]
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=split_ratio, random_state=42
+    return X, y
+
+
+def store_data(data_path):
+    """ Puts data_path into the feature store, returns (name, version) """
+    name = pathlib.Path(data_path).stem
+    # same column order as load_data
+    columns = pd.read_csv(data_path, nrows=0).columns.difference(["sepsis_binary", "sepsis_group"])
+    version = feature_store.build_from_csv(name, data_path, target="sepsis_binary", columns=columns)
+    return name, version
+
+
+def load_from_store(name, version):
+    X, y, meta = feature_store.get(name, version)
+    return (
+        pd.DataFrame(X, columns=meta["columns"], copy=False),
+        pd.Series(y, name=meta["target"], copy=False),
     )
 
-    # Sampling
+
+def resample_training_data(X_train, y_train, sampling_method):
     if sampling_method == "RandomUnderSampler":
         rus = RandomUnderSampler(random_state=42)
         X_train, y_train = rus.fit_resample(X_train, y_train)
@@ -56,61 +98,281 @@ def train_and_save_model(
         )
         X_train = pd.concat([X_train, X_upsampled])
         y_train = pd.concat([y_train, y_upsampled])
+    return X_train, y_train
 
-    # Scaling
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
 
-    # Feature Selection
+def make_selector(feature_selection_method, number_of_features):
     if feature_selection_method == "SelectKBest":
-        selector = SelectKBest(mutual_info_classif, k=number_of_features)
-        X_train_selected = selector.fit_transform(X_train_scaled, y_train)
-        X_test_selected = selector.transform(X_test_scaled)
+        return SelectKBest(mutual_info_classif, k=number_of_features)
     elif feature_selection_method == "RFE":
-        estimator = RandomForestClassifier()
-        selector = RFE(estimator, 5)
-        X_train_selected = selector.fit_transform(X_train_scaled, y_train)
-        X_test_selected = selector.transform(X_test_scaled)
+        return RFE(RandomForestClassifier(), n_features_to_select=number_of_features)
     elif feature_selection_method == "FeatureImportance":
-        model_for_importance = RandomForestClassifier()
-        model_for_importance.fit(X_train_scaled, y_train)
-        selector = SelectFromModel(model_for_importance, threshold=0.05)
-        X_train_selected = selector.fit_transform(X_train_scaled, y_train)
-        X_test_selected = selector.transform(X_test_scaled)
-    else:
-        X_train_selected = X_train_scaled
-        X_test_selected = X_test_scaled
+        return SelectFromModel(RandomForestClassifier(), threshold=0.05)
+    return None
 
-    # Model initialization and training
-    models = {
-        "LR": LogisticRegression(),
-        "SVM": SVC(),
-        "XGBoost": XGBClassifier(eval_metric="mlogloss"),
-        "RF": RandomForestClassifier(),
-        "DT": DecisionTreeClassifier(),
-        "NB": GaussianNB(),
-    }
 
-    model = models[model_name]
+# Preprocessing stages are cached on disk, keyed by a hash of their input data and
+# parameters, so comparing several models on the same data only pays for them once.
+# Set SEPSENSE_CACHE_DIR="" to disable the cache.
+memory = joblib.Memory(os.environ.get("SEPSENSE_CACHE_DIR", ".cache") or None, verbose=0)
+
+
+@memory.cache
+def split_and_resample(X, y, split_ratio, sampling_method):
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=split_ratio, random_state=42
+    )
+    X_train, y_train = resample_training_data(X_train, y_train, sampling_method)
+    return X_train, X_test, y_train, y_test
+
+
+@memory.cache
+def scale(X_train, X_test):
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    return scaler, X_train_scaled, X_test_scaled
+
+
+@memory.cache
+def select_features(X_train, y_train, X_test, feature_selection_method, number_of_features):
+    selector = make_selector(feature_selection_method, number_of_features)
+    if selector is None:
+        return None, X_train, X_test
+    return selector, selector.fit_transform(X_train, y_train), selector.transform(X_test)
+
+
+def preprocess(X, y, split_ratio, sampling_method, feature_selection_method, number_of_features):
+    """ The cached split/resample, scale and select stages of fit_and_evaluate
+
+    returns: (scaler, selector, X_train_selected, X_test_selected, y_train, y_test)
+    """
+    X_train, X_test, y_train, y_test = split_and_resample(X, y, split_ratio, sampling_method)
+    scaler, X_train_scaled, X_test_scaled = scale(X_train, X_test)
+    if feature_selection_method not in ("SelectKBest", "RFE"):
+        number_of_features = None  # unused, keep it out of the cache key
+    selector, X_train_selected, X_test_selected = select_features(
+        X_train_scaled, y_train, X_test_scaled, feature_selection_method, number_of_features
+    )
+    return scaler, selector, X_train_selected, X_test_selected, y_train, y_test
+
+
+def fit_and_evaluate(
+    X,
+    y,
+    model_name="LR",
+    sampling_method=None,
+    split_ratio=0.3,
+    feature_selection_method=None,
+    number_of_features=5,
+    n_jobs=None,
+):
+    """ Trains one model/sampler/selector combination
+
+    returns: (pipeline, metrics) where the pipeline chains the fitted scaler,
+        selector and model, and metrics holds accuracy, roc_auc and recall on the
+        test split
+    """
+    scaler, selector, X_train_selected, X_test_selected, y_train, y_test = preprocess(
+        X, y, split_ratio, sampling_method, feature_selection_method, number_of_features
+    )
+
+    # Model initialization and training
+    model = make_models()[model_name]
+    if n_jobs is not None and "n_jobs" in model.get_params():
+        model.set_params(n_jobs=n_jobs)
     model.fit(X_train_selected, y_train)
 
     # Predictions and evaluation
     y_pred = model.predict(X_test_selected)
-    accuracy = accuracy_score(y_test, y_pred)
-    print(f"{model_name}: {accuracy}")
+    if hasattr(model, "predict_proba"):
+        y_score = model.predict_proba(X_test_selected)[:, 1]
+    else:
+        y_score = model.decision_function(X_test_selected)
+    metrics = {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "roc_auc": roc_auc_score(y_test, y_score),
+        "recall": recall_score(y_test, y_pred),
+    }
+
+    steps = [("scaler", scaler)]
+    if selector is not None:
+        steps.append(("selector", selector))
+    steps.append(("model", model))
+    return Pipeline(steps), metrics
+
+
+def train_and_save_model(
+    data_path,
+    model_name="LR",
+    sampling_method=None,
+    split_ratio=0.3,
+    feature_selection_method=None,
+    model_path="saved_model.pkl",
+    number_of_features=5,
+    use_feature_store=False,
+):
+    X, y = load_data(data_path, use_feature_store)
+    pipeline, metrics = fit_and_evaluate(
+        X, y, model_name, sampling_method, split_ratio, feature_selection_method, number_of_features
+    )
+    print(f"{model_name}: {metrics['accuracy']}")
 
     # Save the model
-    joblib.dump(model, model_path)
+    joblib.dump(pipeline.named_steps["model"], model_path)
+    return metrics
+
+
+def _sweep_grid(model_names, sampling_methods, feature_selection_methods, numbers_of_features):
+    grid = []
+    for model_name, sampling_method, feature_selection_method in itertools.product(
+        model_names, sampling_methods, feature_selection_methods
+    ):
+        # number_of_features only matters for SelectKBest and RFE
+        if feature_selection_method in ("SelectKBest", "RFE"):
+            counts = numbers_of_features
+        else:
+            counts = [None]
+        for number_of_features in counts:
+            grid.append({
+                "model_name": model_name,
+                "sampling_method": sampling_method,
+                "feature_selection_method": feature_selection_method,
+                "number_of_features": number_of_features,
+            })
+    return grid
+
+
+def _warm_sweep_cache(X, y, grid, split_ratio):
+    """ Computes every preprocessing stage of the grid once before the workers start.
+    Cold workers starting at the same time would each compute the same split, scale
+    and select stages in parallel, now they all load them from the cache.
+    """
+    if memory.location is None:
+        return  # no cache to share
+    stages = {(config["sampling_method"], config["feature_selection_method"], config["number_of_features"])
+              for config in grid}
+    for sampling_method, feature_selection_method, number_of_features in sorted(stages, key=str):
+        try:
+            preprocess(X, y, split_ratio, sampling_method, feature_selection_method, number_of_features)
+        except Exception:
+            pass  # the workers run into the same error and report it per configuration
+
+
+_worker_data = {}
+
+
+def _init_sweep_worker(X, y, threads_per_worker, store_ref=None):
+    # Pin BLAS/OpenMP to a few threads, otherwise every worker grabs all cores
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads_per_worker)
+    threadpool_limits(limits=threads_per_worker)
+    if store_ref is not None:
+        # every worker maps the same file instead of receiving a pickled copy
+        X, y = load_from_store(*store_ref)
+    _worker_data["X"] = X
+    _worker_data["y"] = y
+    _worker_data["threads"] = threads_per_worker
+
+
+def _run_sweep_config(config, split_ratio):
+    start = time.perf_counter()
+    try:
+        pipeline, metrics = fit_and_evaluate(
+            _worker_data["X"],
+            _worker_data["y"],
+            split_ratio=split_ratio,
+            n_jobs=_worker_data["threads"],
+            **config,
+        )
+        error = None
+    except Exception as e:
+        pipeline, metrics, error = None, {}, repr(e)
+    return {**config, **metrics, "seconds": time.perf_counter() - start, "error": error}, pipeline
+
+
+def sweep(
+    data_path,
+    model_names=None,
+    sampling_methods=SAMPLING_METHODS,
+    feature_selection_methods=FEATURE_SELECTION_METHODS,
+    numbers_of_features=(5,),
+    split_ratio=0.3,
+    n_jobs=None,
+    threads_per_worker=1,
+    sort_by="roc_auc",
+    best_model_path="best_model.pkl",
+    leaderboard_path="leaderboard.csv",
+    use_feature_store=False,
+):
+    """ Trains every model x sampling x feature selection x number_of_features combination
+    on a process pool and ranks them
+
+    Params:
+        n_jobs: number of worker processes (default: cores // threads_per_worker)
+        threads_per_worker: BLAS/OpenMP/n_jobs threads each worker may use
+        sort_by: "roc_auc", "recall" or "accuracy"
+        use_feature_store: workers memory-map the data from the feature store
+
+    returns: leaderboard DataFrame (best first). The best pipeline (scaler, selector,
+        model) is saved to best_model_path. Raises RuntimeError with the collected
+        errors if no configuration could be trained.
+    """
+    if sort_by not in ("roc_auc", "recall", "accuracy"):
+        raise ValueError(f"sort_by must be roc_auc, recall or accuracy, not {sort_by!r}")
+    if use_feature_store:
+        store_ref = store_data(data_path)
+        X, y = None, None
+    else:
+        store_ref = None
+        X, y = load_data(data_path)
+    model_names = list(make_models()) if model_names is None else model_names
+    grid = _sweep_grid(model_names, sampling_methods, feature_selection_methods, numbers_of_features)
+    if n_jobs is None:
+        n_jobs = max(1, (os.cpu_count() or 1) // threads_per_worker)
+    # the same data as the workers, so the cache keys match
+    _warm_sweep_cache(*(load_from_store(*store_ref) if store_ref else (X, y)), grid, split_ratio)
+
+    rows = []
+    best_pipeline, best_score = None, float("-inf")
+    with ProcessPoolExecutor(
+        max_workers=n_jobs, initializer=_init_sweep_worker, initargs=(X, y, threads_per_worker, store_ref)
+    ) as pool:
+        futures = [pool.submit(_run_sweep_config, config, split_ratio) for config in grid]
+        for future in as_completed(futures):
+            row, pipeline = future.result()
+            rows.append(row)
+            print(f"{row['model_name']} {row['sampling_method']} {row['feature_selection_method']} "
+                  f"{row['number_of_features']}: {row.get(sort_by, row['error'])}")
+            # only the best pipeline is kept in memory
+            if pipeline is not None and row[sort_by] > best_score:
+                best_pipeline, best_score = pipeline, row[sort_by]
+
+    leaderboard = pd.DataFrame(rows)
+    if sort_by not in leaderboard.columns:
+        # every configuration failed, there are no metrics to rank
+        if leaderboard_path and len(leaderboard):
+            leaderboard.to_csv(leaderboard_path, index=False)
+        errors = leaderboard["error"].value_counts() if len(leaderboard) else {}
+        raise RuntimeError(
+            f"no configuration of the sweep could be trained ({len(grid)} configurations):\n"
+            + "\n".join(f"  {count}x {error}" for error, count in errors.items())
+        )
+    leaderboard = leaderboard.sort_values(sort_by, ascending=False, na_position="last")
+    leaderboard = leaderboard.reset_index(drop=True)
+    if leaderboard_path:
+        leaderboard.to_csv(leaderboard_path, index=False)
+    if best_pipeline is not None and best_model_path:
+        joblib.dump(best_pipeline, best_model_path)
+    return leaderboard
 
 
 if __name__ == "__main__":
-    train_and_save_model(
+    leaderboard = sweep(
         data_path="../Data/Neonatal.csv",
-        model_name="LR",
-        sampling_method="RandomUnderSampler",
-        split_ratio=0.3,
-        feature_selection_method=None,#"SelectKBest",
-        model_path="test.pkl",
-        number_of_features=5,
+        numbers_of_features=(3, 5, 8),
+        threads_per_worker=1,
+        best_model_path="best_model.pkl",
+        use_feature_store=True,
     )
+    print(leaderboard.head(10))
@@ -0,0 +1,60 @@
+""" Compares the imputation options of Code/test.py: time and ROC-AUC of the
+XGBoost model trained on the imputed data
+
+Useage:
+    python benchmarks/bench_imputation.py --patients 5000
+    python benchmarks/bench_imputation.py --methods ffill median knn knn_full
+"""
+import argparse
+import pathlib
+import sys
+import time
+
+from imblearn.under_sampling import RandomUnderSampler
+from sklearn.impute import KNNImputer
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from xgboost import XGBClassifier
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "Code"))
+from imputation import forward_fill_patients, make_imputer
+from synthetic import physionet
+
+FEATURES = ["HR", "O2Sat", "Temp", "FiO2", "Age", "Gender", "Resp", "SBP", "MAP", "DBP", "EtCO2"]
+
+
+def run(method, df):
+    """ Same steps as Code/test.py, returns (imputation seconds, ROC-AUC) """
+    start = time.perf_counter()
+    X = forward_fill_patients(df, FEATURES) if method == "ffill" else df[FEATURES]
+    pre_seconds = time.perf_counter() - start
+
+    X_train, X_test, y_train, y_test = train_test_split(X, df["SepsisLabel"], test_size=0.3, random_state=42)
+    X_train, y_train = RandomUnderSampler(random_state=42).fit_resample(X_train, y_train)
+
+    start = time.perf_counter()
+    # knn_full: the original KNNImputer(n_neighbors=5) of test.py
+    imputer = KNNImputer(n_neighbors=5) if method == "knn_full" else make_imputer(method)
+    X_train = imputer.fit_transform(X_train)
+    X_test = imputer.transform(X_test)
+    seconds = pre_seconds + time.perf_counter() - start
+
+    clf = XGBClassifier(objective="binary:logistic", random_state=42).fit(X_train, y_train)
+    return seconds, roc_auc_score(y_test, clf.predict_proba(X_test)[:, 1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=2_000)
+    parser.add_argument("--methods", nargs="+", default=["ffill", "median", "knn", "knn_full"])
+    args = parser.parse_args()
+
+    df = physionet(args.patients)
+    print(f"{len(df)} rows, {args.patients} patients")
+    for method in args.methods:
+        seconds, auc = run(method, df)
+        print(f"{method:9s} imputation {seconds:7.2f}s   ROC-AUC {auc:.3f}")
+
+
+if __name__ == "__main__":
+    main()
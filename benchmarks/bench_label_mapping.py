@@ -0,0 +1,42 @@
+""" Compares the vectorized label mapping with the old row-wise apply(map_to_binary)
+
+Useage:
+    python benchmarks/bench_label_mapping.py --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from sepsense.labels import map_labels, map_to_binary
+
+
+def best_of(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    groups = pd.Series(np.random.default_rng(42).integers(1, 6, args.rows))
+
+    apply_seconds, expected = best_of(lambda: groups.apply(map_to_binary), args.repeats)
+    vector_seconds, result = best_of(lambda: map_labels(groups), args.repeats)
+    assert (expected.to_numpy() == result.to_numpy()).all()
+
+    print(f"{args.rows} rows")
+    print(f"apply(map_to_binary): {apply_seconds * 1000:.1f}ms")
+    print(f"map_labels:           {vector_seconds * 1000:.1f}ms ({apply_seconds / vector_seconds:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+""" Cold and warm page-load latency of the Streamlit app
+
+cold: a fresh interpreter imports streamlit, multiapp and one page module, like the
+      first visit of that page after the server started
+warm: the same page module again in the same process, like every later rerun
+eager: a fresh interpreter imports every page module up front (how app.py worked
+      before the pages were registered lazily)
+
+Useage:
+    python benchmarks/bench_startup.py --repeats 5
+"""
+import argparse
+import importlib
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = pathlib.Path(__file__).resolve().parents[1] / "App"
+
+PAGES = {
+    "Home": "apps.home",
+    "Data Cleaner": "apps.data_cleaner",
+    "Visualize": "apps.data_visualisation",
+    "Model": "apps.model",
+    "inference": "apps.inference",
+}
+
+COLD = """
+import time
+start = time.perf_counter()
+import streamlit, multiapp
+{imports}
+print(time.perf_counter() - start)
+"""
+
+
+def cold(modules, repeats):
+    imports = "\n".join(f"import {module}" for module in modules)
+    times = []
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-c", COLD.format(imports=imports)],
+            cwd=APP_DIR, capture_output=True, text=True, check=True,
+        )
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def warm(module, repeats):
+    sys.path.insert(0, str(APP_DIR))
+    importlib.import_module(module)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        importlib.import_module(module)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    eager = cold(PAGES.values(), args.repeats)
+    print(f"{'page':14s} {'cold':>9s} {'warm':>9s}")
+    for title, module in PAGES.items():
+        print(f"{title:14s} {cold([module], args.repeats) * 1000:7.0f}ms {warm(module, args.repeats) * 1e6:7.1f}us")
+    print(f"{'eager (all)':14s} {eager * 1000:7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+""" Benchmark suite of the whole pipeline on synthetic data: PhysioNet ingestion,
+cleaning, training of every model of train_model.make_models() and single-row vs
+batch inference latency
+
+The results are written as json (meta + one entry per benchmark with seconds and
+rows_per_s). Every benchmark runs --repeat times (default 3) and reports the median,
+single runs are too noisy with small --rows. With --baseline every benchmark is compared
+with an earlier result file and the script exits with 1 if one got slower than
+--threshold (default 20%). The comparison is skipped if the baseline was measured with
+other package versions or another number of cpus.
+
+Useage:
+    python benchmarks/run_benchmarks.py --rows 100000 --output bench.json --save-baseline baseline.json
+    python benchmarks/run_benchmarks.py --rows 100000 --baseline baseline.json
+    python benchmarks/run_benchmarks.py --rows 10000000 --physionet-rows 10000000 --models LR XGBoost NB
+
+Every run works in a fresh temporary directory with its own SEPSENSE_CACHE_DIR, so
+the cleaning cache (sepsense.cleaning.run_spec) and the joblib cache of train_model do not
+turn later runs into cache hits. The cleaning cache is also cleared before every repeat.
+"""
+import argparse
+import json
+import os
+import pathlib
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# before the repo modules are imported, they read the cache directory at import time
+WORK_DIR = tempfile.mkdtemp(prefix="sepsense-bench-")
+os.environ["SEPSENSE_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Code"))
+sys.path.insert(0, str(ROOT / "App"))
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import synthetic
+from sepsense.cleaning import CACHE_DIR, NEONATAL_SPEC
+from apps.helpers import clean_data
+from data_preparation import clean_neonatal_data
+from physionet_to_csv import convert_psv_to_csv
+import train_model
+
+PACKAGES = ["numpy", "pandas", "sklearn", "xgboost", "imblearn", "joblib"]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def repeated(func, repeat, before=None):
+    """ runs func repeat times (before() untimed ahead of each run)
+
+    returns: median seconds, result of the last run
+    """
+    times = []
+    for _ in range(max(1, repeat)):
+        if before is not None:
+            before()
+        seconds, result = timed(func)
+        times.append(seconds)
+    return statistics.median(times), result
+
+
+def clear_cleaning_cache():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+
+def entry(seconds, rows, **extra):
+    return {"seconds": seconds, "rows": rows, "rows_per_s": rows / max(seconds, 1e-9), **extra}
+
+
+def bench_ingestion(n_rows, workers, repeat):
+    """ convert_psv_to_csv of a folder with one .psv file per patient """
+    # physionet() draws 20-59 hours per patient
+    df = synthetic.physionet(n_patients=max(1, n_rows // 40))
+    folder = os.path.join(WORK_DIR, "psv")
+    synthetic.write_psv_folder(df, folder)
+    output = os.path.join(WORK_DIR, "physionet.csv")
+    seconds, report = repeated(lambda: convert_psv_to_csv(folder, output, workers=workers), repeat)
+    return {"convert_psv_to_csv": entry(seconds, report["rows"], files=report["files"], workers=workers,
+                                        repeats=repeat)}
+
+
+def bench_cleaning(n_rows, repeat):
+    """ clean_neonatal_data (registry spec) and clean_data (Data Cleaner page) of
+    the same raw registry rows
+
+    returns: results, path of the cleaned Neonatal.csv
+    """
+    raw = synthetic.neonatal(n_rows)
+    data_dir = os.path.join(WORK_DIR, "Data")
+    os.makedirs(data_dir, exist_ok=True)
+    raw.to_csv(os.path.join(data_dir, "Neonatal_Sepsis_Registry.csv"), index=False)
+    results = {}
+
+    seconds, _ = repeated(lambda: clean_neonatal_data(file_path=data_dir, file_name="Neonatal_Sepsis_Registry.csv"),
+                          repeat, before=clear_cleaning_cache)
+    results["clean_neonatal_data"] = entry(seconds, n_rows, repeats=repeat)
+
+    # clean_data writes to data/{name}.csv relative to the working directory, like in the app
+    columns = [column for column in NEONATAL_SPEC["columns"] if column != "sepsis_group"]
+    os.makedirs(os.path.join(WORK_DIR, "data"), exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(WORK_DIR)
+    try:
+        seconds, _ = repeated(lambda: clean_data(raw, "bench", columns, "sepsis_group", label_mapping="binary"),
+                              repeat, before=clear_cleaning_cache)
+    finally:
+        os.chdir(cwd)
+    results["clean_data"] = entry(seconds, n_rows, repeats=repeat)
+    return results, os.path.join(data_dir, "Neonatal.csv")
+
+
+def bench_training(data_path, model_names, train_rows, repeat):
+    """ train_and_save_model of every model on the cleaned registry
+
+    returns: results, {model_name: path of the saved model}
+    """
+    cleaned = pd.read_csv(data_path)
+    if train_rows and len(cleaned) > train_rows:
+        # SVM and RF do not scale to millions of rows, the fit is timed on a sample
+        data_path = os.path.join(WORK_DIR, "Neonatal_train.csv")
+        cleaned.sample(train_rows, random_state=42).to_csv(data_path, index=False)
+        cleaned = None
+    n_rows = train_rows if cleaned is None else len(cleaned)
+
+    results, model_paths = {}, {}
+    for model_name in model_names:
+        model_path = os.path.join(WORK_DIR, f"{model_name}.pkl")
+        # split/scale/select are joblib-cached, every run pays them like a first run
+        seconds, metrics = repeated(lambda: train_model.train_and_save_model(
+            data_path, model_name=model_name, model_path=model_path),
+            repeat, before=lambda: train_model.memory.clear(warn=False))
+        results[f"train_{model_name}"] = entry(seconds, n_rows, accuracy=metrics["accuracy"], repeats=repeat)
+        model_paths[model_name] = model_path
+    return results, model_paths
+
+
+def bench_inference(data_path, model_paths, batch_size, single_calls, repeat):
+    """ Latency of one predict_proba call with a single row (median of single_calls
+    calls) and of one call with batch_size rows (median of repeat calls)
+    """
+    X, _ = train_model.load_data(data_path)
+    X = X.to_numpy(dtype=np.float64)
+    batch = X[np.resize(np.arange(len(X)), batch_size)]
+
+    results = {}
+    for model_name, model_path in model_paths.items():
+        model = joblib.load(model_path)
+        # SVC() is trained without probability estimates
+        method = "predict_proba" if hasattr(model, "predict_proba") else "decision_function"
+        predict = getattr(model, method)
+        predict(batch[:1])  # warm up
+
+        single = []
+        for row in batch[:single_calls]:
+            start = time.perf_counter()
+            predict(row[None, :])
+            single.append(time.perf_counter() - start)
+        seconds = statistics.median(single)
+        results[f"predict_single_{model_name}"] = entry(seconds, 1, method=method, calls=len(single))
+
+        seconds, _ = repeated(lambda: predict(batch), repeat)
+        results[f"predict_batch_{model_name}"] = entry(
+            seconds, batch_size, method=method, seconds_per_row=seconds / batch_size, repeats=repeat)
+    return results
+
+
+def package_versions():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = __import__(package).__version__
+        except ImportError:
+            versions[package] = None
+    return versions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_changes(meta, baseline):
+    """ returns: the differences of cpus and package versions between this run and the
+    baseline, timings of different environments are not comparable
+    """
+    before = baseline.get("meta", {})
+    changes = []
+    if before.get("cpus") != meta["cpus"]:
+        changes.append(f"cpus {before.get('cpus')} -> {meta['cpus']}")
+    packages = before.get("packages", {})
+    for package, version in meta["packages"].items():
+        if packages.get(package) != version:
+            changes.append(f"{package} {packages.get(package)} -> {version}")
+    return changes
+
+
+def compare(results, baseline, threshold):
+    """ returns: the names of the benchmarks that are more than threshold slower than
+    in the baseline (only benchmarks run with the same number of rows are compared)
+    """
+    regressions = []
+    print(f"\n{'benchmark':34s} {'baseline':>10s} {'now':>10s} {'change':>8s}")
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before is None or before["rows"] != result["rows"]:
+            print(f"{name:34s} {'-':>10s} {result['seconds']:10.4f}")
+            continue
+        change = result["seconds"] / max(before["seconds"], 1e-9) - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:34s} {before['seconds']:10.4f} {result['seconds']:10.4f} {change:+7.1%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000, help="rows of the synthetic neonatal registry")
+    parser.add_argument("--physionet-rows", type=int, default=None,
+                        help="about this many hourly PhysioNet rows (default --rows)")
+    parser.add_argument("--models", nargs="+", default=list(train_model.make_models()))
+    parser.add_argument("--train-rows", type=int, default=200_000,
+                        help="train on a sample of at most this many cleaned rows (0: all)")
+    parser.add_argument("--workers", type=int, default=1, help="processes of convert_psv_to_csv")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--single-calls", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the median is reported")
+    parser.add_argument("--skip", nargs="*", default=[], choices=["ingestion", "cleaning", "training", "inference"])
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="result file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--save-baseline", help="also write the results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary directory")
+    args = parser.parse_args()
+
+    results = {}
+    try:
+        if "ingestion" not in args.skip:
+            results.update(bench_ingestion(args.physionet_rows or args.rows, args.workers, args.repeat))
+        cleaned_path = None
+        if not {"cleaning", "training", "inference"} <= set(args.skip):
+            # training and inference need the cleaned registry
+            cleaning, cleaned_path = bench_cleaning(args.rows, args.repeat)
+            if "cleaning" not in args.skip:
+                results.update(cleaning)
+        model_paths = {}
+        if not {"training", "inference"} <= set(args.skip):
+            training, model_paths = bench_training(cleaned_path, args.models, args.train_rows, args.repeat)
+            if "training" not in args.skip:
+                results.update(training)
+        if "inference" not in args.skip:
+            results.update(bench_inference(cleaned_path, model_paths, args.batch_size, args.single_calls, args.repeat))
+    finally:
+        if args.keep:
+            print(f"temporary files in {WORK_DIR}")
+        else:
+            shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "packages": package_versions(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1)
+
+    print(f"\n{'benchmark':34s} {'seconds':>10s} {'rows/s':>12s}")
+    for name, result in results.items():
+        print(f"{name:34s} {result['seconds']:10.4f} {result['rows_per_s']:12.0f}")
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changes = environment_changes(report["meta"], baseline)
+        if changes:
+            print(f"\nbaseline not compared, other environment: {', '.join(changes)}")
+            return
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+""" Synthetic stand-ins for the clinical datasets, so the benchmarks run without
+the (non-public) data
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+NEONATAL_FLAGS = [
+    "stat_abx",
+    "intubated_at_time_of_sepsis_evaluation",
+    "inotrope_at_time_of_sepsis_eval",
+    "central_venous_line",
+    "umbilical_arterial_line",
+    "ecmo",
+    "comorbidity_necrotizing_enterocolitis",
+    "comorbidity_chronic_lung_disease",
+    "comorbidity_cardiac",
+    "comorbidity_surgical",
+    "comorbidity_ivh_or_shunt",
+]
+
+# baseline, hourly noise, change at sepsis onset and share of missing hours
+PHYSIONET_VITALS = {
+    "HR": (85, 3.0, 15, 0.10),
+    "O2Sat": (97, 0.8, -2, 0.13),
+    "Temp": (37, 0.15, 1.0, 0.66),
+    "SBP": (122, 4.0, -12, 0.15),
+    "MAP": (82, 3.0, -10, 0.12),
+    "DBP": (63, 3.0, -8, 0.31),
+    "Resp": (18, 1.0, 5, 0.15),
+    "EtCO2": (33, 1.5, -3, 0.96),
+    "FiO2": (0.5, 0.03, 0.1, 0.92),
+}
+
+
+def physionet(n_patients=2_000, sepsis_rate=0.08, seed=42):
+    """ Hourly PhysioNet/Kaggle-like rows: Patient_ID, ICULOS, vitals, Age, Gender,
+    SepsisLabel (1 from six hours before onset on, like the challenge labels)
+    """
+    rng = np.random.default_rng(seed)
+    hours = rng.integers(20, 60, n_patients)
+    patient = np.repeat(np.arange(n_patients), hours)
+    starts = np.cumsum(hours) - hours
+    iculos = np.arange(len(patient)) - np.repeat(starts, hours) + 1
+
+    septic = rng.random(n_patients) < sepsis_rate
+    onset = np.where(septic, (hours * rng.uniform(0.5, 0.9, n_patients)).astype(int), 10_000)
+    hours_to_onset = iculos - np.repeat(onset, hours)
+    # 0 before the onset, rising to 1 over the following hours
+    severity = np.clip((hours_to_onset + 6) / 12, 0, 1)
+
+    df = pd.DataFrame({"Patient_ID": patient, "ICULOS": iculos})
+    for name, (base, noise, shift, missing) in PHYSIONET_VITALS.items():
+        offset = np.repeat(rng.normal(0, noise * 3, n_patients), hours)
+        walk = rng.normal(0, noise, len(patient))
+        values = base + offset + walk + shift * severity
+        values[rng.random(len(patient)) < missing] = np.nan
+        df[name] = values.astype(np.float32)
+    df["Age"] = np.repeat(rng.uniform(18, 90, n_patients).round(), hours)
+    df["Gender"] = np.repeat(rng.integers(0, 2, n_patients), hours)
+    df["SepsisLabel"] = (hours_to_onset >= -6).astype(np.int8)
+    return df
+
+
+def neonatal(n_rows=10_000, missing_rate=0.02, seed=42):
+    """ Rows shaped like the raw Neonatal_Sepsis_Registry.csv: the columns of
+    NEONATAL_SPEC plus a few the cleaning drops, "NI" for missing answers and
+    sepsis_group codes 1-6 (1, 4 and 5 count as sepsis)
+    """
+    rng = np.random.default_rng(seed)
+    group = rng.choice([1, 2, 3, 4, 5, 6], n_rows, p=[0.1, 0.35, 0.3, 0.08, 0.07, 0.1])
+    septic = np.isin(group, [1, 4, 5])
+    df = pd.DataFrame({
+        "record_id": np.arange(n_rows),
+        "site": rng.integers(1, 12, n_rows),
+        "sex": rng.integers(0, 2, n_rows),
+        "birth_weight_kg": rng.normal(2.4, 0.9, n_rows).clip(0.4, 5).round(3),
+        "sepsis_group": group,
+        "onset_age_in_days": rng.integers(0, 90, n_rows),
+        "onset_hour_of_day": rng.integers(0, 24, n_rows),
+        "temp_celsius": (rng.normal(37, 0.6, n_rows) + 0.7 * septic).round(1),
+    })
+    for flag in NEONATAL_FLAGS:
+        df[flag] = (rng.random(n_rows) < 0.15 + 0.25 * septic).astype(int)
+    df["notes"] = rng.choice(["", "transfer", "readmission"], n_rows)
+    # missing answers are coded as "NI" in the registry
+    for column in ["sex", "birth_weight_kg", "temp_celsius"] + NEONATAL_FLAGS[:3]:
+        df[column] = df[column].astype(object).where(rng.random(n_rows) >= missing_rate, "NI")
+    return df
+
+
+def write_psv_folder(df, folder, chunk_rows=500_000):
+    """ Writes physionet() rows as one PhysioNet .psv file per patient
+
+    The rows are formatted chunk by chunk in one to_csv call and then split at the
+    patient boundaries, a to_csv call per patient is far too slow for 10M rows.
+    """
+    os.makedirs(folder, exist_ok=True)
+    columns = [col for col in df.columns if col != "Patient_ID"]
+    header = "|".join(columns) + "\n"
+    patients = df["Patient_ID"].to_numpy()
+    starts = np.concatenate([[0], np.flatnonzero(patients[1:] != patients[:-1]) + 1, [len(df)]])
+    first = 0
+    while first < len(starts) - 1:
+        # whole patients, about chunk_rows rows
+        last = max(first + 1, int(np.searchsorted(starts, starts[first] + chunk_rows, side="right")) - 1)
+        last = min(last, len(starts) - 1)
+        lines = df.iloc[starts[first]:starts[last]][columns].to_csv(
+            sep="|", index=False, header=False, na_rep="NaN").splitlines(keepends=True)
+        offset = starts[first]
+        for begin, end in zip(starts[first:last], starts[first + 1:last + 1]):
+            with open(os.path.join(folder, f"p{patients[begin]:06d}.psv"), "w") as f:
+                f.write(header + "".join(lines[begin - offset:end - offset]))
+        first = last
@@ -0,0 +1,7 @@
+""" Modules shared by the Streamlit app (App/) and the scripts in Code/
+
+    labels: sepsis label mapping
+    cleaning: declarative cleaning specs
+    dtypes: dtype downcasting of loaded datasets
+    feature_store: memory-mapped, versioned feature matrices
+"""
@@ -0,0 +1,330 @@
+import hashlib
+import json
+import operator
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from sepsense.labels import map_labels
+
+CACHE_DIR = os.path.join(os.environ.get("SEPSENSE_CACHE_DIR", ".cache") or ".cache", "cleaning")
+# size cap of CACHE_DIR, the least recently used results are deleted above it
+CACHE_MAX_MB = float(os.environ.get("SEPSENSE_CLEANING_CACHE_MB", 1024))
+# part of the cache key: bump it when a cleaning step (compile_spec, run_spec,
+# map_labels) changes its output, so results of the old code are not served
+CLEANING_VERSION = 2
+
+# Cleaning of the neonatal sepsis registry (Code/data_preparation.clean_neonatal_data)
+NEONATAL_SPEC = {
+    "columns": [
+        "sex",
+        "birth_weight_kg",
+        "sepsis_group",
+        "onset_age_in_days",
+        "onset_hour_of_day",
+        "stat_abx",
+        "intubated_at_time_of_sepsis_evaluation",
+        "inotrope_at_time_of_sepsis_eval",
+        "central_venous_line",
+        "umbilical_arterial_line",
+        "ecmo",
+        "temp_celsius",
+        "comorbidity_necrotizing_enterocolitis",
+        "comorbidity_chronic_lung_disease",
+        "comorbidity_cardiac",
+        "comorbidity_surgical",
+        "comorbidity_ivh_or_shunt",
+    ],
+    "missing_tokens": ["NI"],
+    "filters": [{"column": "sepsis_group", "op": "!=", "value": 6}],
+    "label": {"column": "sepsis_group", "mapping": "binary", "target": "sepsis_binary", "drop_source": True},
+    "dropna": True,
+    "dtypes": {},
+}
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda column, values: column.isin(values),
+    "not in": lambda column, values: ~column.isin(values),
+}
+
+
+def target_spec(columns, pred_col, label_mapping=None):
+    """ Spec of the Data Cleaner page: the selected columns plus pred_col as "target" """
+    return {
+        "columns": list(columns) + [pred_col],
+        "missing_tokens": ["NI"],
+        "filters": [],
+        "label": {"column": pred_col, "mapping": label_mapping, "target": "target", "drop_source": True},
+        "dropna": True,
+        "dtypes": {},
+    }
+
+
+def spec_hash(spec):
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def compile_spec(spec):
+    """ Turns a cleaning spec into one function DataFrame -> cleaned DataFrame
+
+    spec keys (all optional except columns):
+        columns: columns to keep
+        missing_tokens: values that mean missing, e.g. ["NI"]
+        filters: [{"column", "op", "value"}], op one of OPERATORS, rows failing any
+            filter are dropped
+        label: {"column", "mapping", "target", "drop_source"}: target = mapped column,
+            mapping as in sepsense.labels.map_labels, None copies the column
+        dropna: drop rows with any missing value
+        dtypes: {column: dtype} applied at the end
+    """
+    columns = list(spec["columns"])
+    missing = list(spec.get("missing_tokens", []))
+    filters = [(f["column"], OPERATORS[f["op"]], f["value"]) for f in spec.get("filters", [])]
+    label = spec.get("label")
+    dropna = spec.get("dropna", True)
+    dtypes = spec.get("dtypes", {})
+
+    def clean(df):
+        df = df[columns]
+        if missing:
+            df = df.replace(missing, np.nan)
+        if filters:
+            keep = np.ones(len(df), dtype=bool)
+            for column, op, value in filters:
+                values = df[column]
+                if isinstance(value, (int, float)):
+                    values = pd.to_numeric(values, errors="coerce")
+                keep &= op(values, value).to_numpy()
+            df = df[keep]
+        if label:
+            source = df[label["column"]]
+            df = df.assign(**{label["target"]: source if label.get("mapping") is None else map_labels(source, label["mapping"])})
+            if label.get("drop_source", True) and label["column"] != label["target"]:
+                df = df.drop(columns=[label["column"]])
+        if dropna:
+            df = df.dropna()
+        if dtypes:
+            df = df.astype(dtypes)
+        return df
+
+    return clean
+
+
+def stable_dtypes(df, spec):
+    """ Numeric columns as float64, so every chunk of run_spec writes a column the same
+    way (per-chunk type inference gives 1 in one chunk and 1.0 in the next). Columns
+    with an explicit dtype in the spec and a mapped label keep their dtype.
+    """
+    keep = set(spec.get("dtypes", {}))
+    label = spec.get("label")
+    if label and label.get("mapping") is not None:
+        keep.add(label["target"])
+    floats = {
+        column: np.float64 for column in df.columns
+        if column not in keep and pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])
+    }
+    return df.astype(floats)
+
+
+def _read_chunks(source, spec, chunksize):
+    # the missing tokens are parsed as NaN, otherwise a chunk with "NI" in a numeric
+    # column is read as text and written differently than the other chunks
+    try:
+        yield from pd.read_csv(source, usecols=spec["columns"], chunksize=chunksize,
+                               na_values=spec.get("missing_tokens", []))
+    except pd.errors.EmptyDataError:
+        return  # no header either, written as a file with only the header
+
+
+def _write_atomic(src, output):
+    """ Copies src to output through a temporary file in the output folder, readers
+    (e.g. the dataset list of the app) never see a half written file
+    """
+    folder = os.path.dirname(os.path.abspath(output))
+    fd, tmp = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=folder)
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, output)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _link_atomic(src, output):
+    """ Hard-links src to output (replacing it atomically), the result is on disk only
+    once. Falls back to a copy across filesystems or where links are not supported.
+    """
+    folder = os.path.dirname(os.path.abspath(output))
+    tmp = os.path.join(folder, f".{os.path.basename(output)}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        _write_atomic(src, output)
+        return
+    try:
+        os.replace(tmp, output)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _input_hash(source):
+    sha1 = hashlib.sha1()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha1.update(block)
+    else:
+        source.seek(0)
+        for block in iter(lambda: source.read(1024 * 1024), b""):
+            sha1.update(block)
+        source.seek(0)
+    return sha1.hexdigest()
+
+
+def _input_key(source, cache_dir, max_entries=1000):
+    """ Hash of the input. For files the hash is remembered under (path, size, mtime)
+    in <cache_dir>/inputs.json, an unchanged file is not read again. Uploads (file
+    objects) have no mtime and are always hashed.
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        return _input_hash(source)
+    stat = os.stat(source)
+    file_key = f"{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}"
+    index_path = os.path.join(cache_dir, "inputs.json")
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    if file_key in index:
+        return index[file_key]
+
+    index[file_key] = _input_hash(source)
+    # newest entries last, the oldest are dropped
+    index = dict(list(index.items())[-max_entries:])
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+    with os.fdopen(fd, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, index_path)
+    return index[file_key]
+
+
+def _evict(cache_dir, max_bytes, keep):
+    """ Deletes the least recently used results (by mtime, a hit touches its files)
+    until the cache is at most max_bytes, never the result keep
+    """
+    results = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".csv") and name[:-4] != keep:
+            path = os.path.join(cache_dir, name)
+            try:
+                results.append((os.path.getmtime(path), os.path.getsize(path), name[:-4]))
+            except OSError:
+                continue  # deleted by a concurrent run
+    total = sum(size for _, size, _ in results)
+    keep_csv = os.path.join(cache_dir, f"{keep}.csv")
+    if os.path.exists(keep_csv):
+        total += os.path.getsize(keep_csv)
+    for _, size, key in sorted(results):
+        if total <= max_bytes:
+            break
+        for suffix in (".csv", ".json"):
+            try:
+                os.remove(os.path.join(cache_dir, key + suffix))
+            except OSError:
+                pass
+        total -= size
+
+
+def run_spec(spec, source, output, chunksize=100_000, cache_dir=CACHE_DIR, cache_max_mb=CACHE_MAX_MB):
+    """ inputs:
+            spec: cleaning spec, see compile_spec
+            source: csv file (path or binary file object, e.g. an upload)
+            output: csv file to write
+
+       outputs:
+           writes output and returns rows_in, rows_out, seconds, rows_per_s and cached
+
+    - Reads, cleans and writes the file chunk by chunk in a single pass
+    - Numeric columns are written as floats in every chunk (see stable_dtypes), so
+      the csv is not byte-identical to cleaning the whole frame at once
+    - The header is always written, also for an empty input
+    - output is replaced only once it is complete, an error leaves the old file
+    - The result is cached under the hash of the spec, CLEANING_VERSION and the
+      input, running the same spec on the same file again only links the cached csv
+      to output (hard link, a copy across filesystems). An unchanged file (same path,
+      size and mtime) is not hashed again. The cache is kept below cache_max_mb by
+      deleting the least recently used results, a result larger than cache_max_mb is
+      not cached at all.
+    """
+    start = time.perf_counter()
+    os.makedirs(cache_dir, exist_ok=True)
+    key = f"{spec_hash([spec, CLEANING_VERSION])}_{_input_key(source, cache_dir)}"
+    cached_csv = os.path.join(cache_dir, f"{key}.csv")
+    cached_stats = os.path.join(cache_dir, f"{key}.json")
+
+    max_bytes = cache_max_mb * 1024 ** 2
+    stats = None
+    if os.path.exists(cached_csv):
+        try:
+            with open(cached_stats) as f:
+                stats = json.load(f)
+            # the csv shares its inode with earlier outputs, one rewritten in place
+            # (e.g. by clean_data) changed the cached result as well
+            if stats.get("bytes") != os.path.getsize(cached_csv):
+                raise ValueError(cached_csv)
+            # most recently used, see _evict
+            os.utime(cached_csv)
+            cached = True
+        except (OSError, ValueError):
+            stats = None  # evicted by a concurrent run, incomplete or changed
+    if stats is None:
+        clean = compile_spec(spec)
+        stats = {"rows_in": 0, "rows_out": 0}
+        # own temporary file, concurrent runs of the same key do not write into each other
+        fd, tmp_csv = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+        try:
+            with os.fdopen(fd, "w", newline="") as f:
+                header = list(clean(pd.DataFrame(columns=spec["columns"])).columns)
+                pd.DataFrame(columns=header).to_csv(f, index=False)
+                for chunk in _read_chunks(source, spec, chunksize):
+                    stats["rows_in"] += len(chunk)
+                    chunk = stable_dtypes(clean(chunk), spec)
+                    chunk.to_csv(f, header=False, index=False, columns=header)
+                    stats["rows_out"] += len(chunk)
+            stats["bytes"] = os.path.getsize(tmp_csv)
+            if stats["bytes"] > max_bytes:
+                # too large for the cache, the result only goes to output
+                _link_atomic(tmp_csv, output)
+                os.remove(tmp_csv)
+                for path in (cached_csv, cached_stats):
+                    if os.path.exists(path):
+                        os.remove(path)  # changed result of an earlier run
+            else:
+                # the stats first, a cached csv always has its stats
+                with open(cached_stats, "w") as f:
+                    json.dump(stats, f)
+                os.replace(tmp_csv, cached_csv)
+        except BaseException:
+            if os.path.exists(tmp_csv):
+                os.remove(tmp_csv)
+            raise
+        cached = False
+
+    if stats["bytes"] <= max_bytes:
+        _link_atomic(cached_csv, output)
+        _evict(cache_dir, max_bytes, keep=key)
+    seconds = time.perf_counter() - start
+    return {**stats, "seconds": seconds, "rows_per_s": stats["rows_in"] / max(seconds, 1e-9), "cached": cached}
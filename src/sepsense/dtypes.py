@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+
+def _memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+# target columns of the datasets, their class codes become the smallest integer type
+LABEL_COLUMNS = ("target", "sepsis_binary", "sepsis_group", "SepsisLabel")
+# float32 holds every integer up to 2**24 exactly, larger ones (e.g. ids) stay int64
+FLOAT32_EXACT = 2 ** 24
+
+
+def optimize_dtypes(df, categorical_ratio=0.5, label_columns=LABEL_COLUMNS):
+    """ inputs:
+            df: DataFrame as read by pd.read_csv (float64/int64/object columns)
+            categorical_ratio: object columns with fewer distinct values than this
+                share of the rows become categorical
+            label_columns: target columns, whole-number codes become integers
+
+       outputs:
+           (compact DataFrame, report with before_mb, after_mb and the changed columns)
+
+    - whole-number label columns without missing values become the smallest integer type
+    - all numeric features become float32, also 0/1 flags (sex, ecmo, comorbidity_*)
+      and whole-number ones (onset age, counts, ...): small integer types overflow in
+      later arithmetic and SMOTE keeps the input dtype, so it would truncate its
+      interpolated samples to integers
+    - repetitive text columns become categorical
+    """
+    before = _memory_mb(df)
+    converted = {}
+    for col in df.columns:
+        values = df[col]
+        old = values.dtype
+        if pd.api.types.is_bool_dtype(old):
+            continue
+        if pd.api.types.is_numeric_dtype(old):
+            if col in label_columns and not values.isna().any() and (values % 1 == 0).all():
+                new = pd.to_numeric(values.astype(np.int64), downcast="integer")
+            elif pd.api.types.is_integer_dtype(old) and values.abs().max() > FLOAT32_EXACT:
+                continue
+            else:
+                new = values.astype(np.float32)
+        elif pd.api.types.is_object_dtype(old):
+            if values.nunique(dropna=True) < categorical_ratio * len(values):
+                new = values.astype("category")
+            else:
+                continue
+        else:
+            continue
+        if new.dtype != old:
+            converted[col] = new
+    compact = df.assign(**converted) if converted else df
+    report = {
+        "before_mb": before,
+        "after_mb": _memory_mb(compact),
+        "columns": {col: (str(df[col].dtype), str(new.dtype)) for col, new in converted.items()},
+    }
+    return compact, report
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = os.path.join(os.environ.get("SEPSENSE_CACHE_DIR", ".cache") or ".cache", "features")
+
+
+class FeatureStore:
+    """ Versioned, memory-mapped feature matrices
+
+    Useage:
+        store = FeatureStore()
+        version = store.build_from_csv("neonatal", "data/neonatal.csv", target="target")
+        X, y, meta = store.get("neonatal")        # np.memmap, nothing is parsed or copied
+        temp = store.column("neonatal", "temp_celsius")
+        patients, labels = store.ids("physionet", "Patient_ID")
+
+    Layout: <root>/<name>/<version>/{X.npy, y.npy, meta.json}. X is float32 in C order
+    with the column order fixed in meta.json, so row slices X[a:b] and single columns
+    X[:, j] are views of the file. ID columns (e.g. Patient_ID "p000001") are not
+    features, they are stored factorized as int64 codes in <column>.ids.npy, the
+    labels of the codes in meta.json. y is int64 if every label is a whole number,
+    otherwise float64 (e.g. NaN labels), decided over the whole column.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def _dir(self, name, version):
+        return os.path.join(self.root, name, version)
+
+    def versions(self, name):
+        """ Versions of a dataset, oldest first """
+        path = os.path.join(self.root, name)
+        if not os.path.isdir(path):
+            return []
+        versions = [v for v in os.listdir(path) if os.path.exists(os.path.join(path, v, "meta.json"))]
+        return sorted(versions, key=lambda v: self.meta(name, v)["created"])
+
+    def meta(self, name, version=None):
+        version = version or self.latest(name)
+        with open(os.path.join(self._dir(name, version), "meta.json")) as f:
+            return json.load(f)
+
+    def latest(self, name):
+        versions = self.versions(name)
+        if not versions:
+            raise KeyError(f"no dataset {name!r} in {self.root}")
+        return versions[-1]
+
+    def build_from_csv(self, name, csv_path, target, columns=None, exclude=(), ids=(), chunksize=100_000):
+        """ Parses csv_path once into a new version of name and returns the version.
+
+        Params:
+            target: column stored as y
+            columns: feature columns in the order to store them (default: all others)
+            exclude: columns that are neither features nor target
+            ids: ID columns stored factorized next to X (see ids()), not as features
+
+        Feature columns must be numeric, a text column raises ValueError instead of
+        being stored as NaN. The version is derived from the file's path, mtime and
+        size and the selected columns, so calling this again for an unchanged file
+        returns the existing version without reading it.
+        """
+        ids = list(ids)
+        if columns is None:
+            header = pd.read_csv(csv_path, nrows=0).columns
+            columns = [col for col in header if col != target and col not in exclude]
+        columns = [col for col in columns if col not in ids]
+        stat = os.stat(csv_path)
+        source = f"{os.path.abspath(csv_path)}:{stat.st_mtime_ns}:{stat.st_size}"
+        version = hashlib.sha1(json.dumps([source, columns, target, ids]).encode()).hexdigest()[:12]
+        if os.path.exists(os.path.join(self._dir(name, version), "meta.json")):
+            return version
+
+        # upper bound for the memmaps: blank lines and quoted newlines make the file
+        # longer than the parsed rows, _write trims to the rows actually written
+        with open(csv_path, "rb") as f:
+            max_rows = sum(1 for _ in f)
+        chunks = pd.read_csv(csv_path, usecols=columns + ids + [target], chunksize=chunksize)
+        return self._write(name, version, columns, target, max_rows, chunks, source, ids)
+
+    def put(self, name, X, y=None, target=None, version=None, ids=()):
+        """ Stores a DataFrame (and target Series) as a new version, returns the version """
+        version = version or time.strftime("%Y%m%d%H%M%S")
+        target = target or (y.name if y is not None else None)
+        df = X.assign(**{target: y.to_numpy()}) if y is not None else X
+        columns = [col for col in X.columns if col not in ids]
+        return self._write(name, version, columns, target, len(df), [df], "put", list(ids))
+
+    @staticmethod
+    def _numeric(chunk, columns):
+        values = chunk[columns]
+        text = [col for col in columns if not pd.api.types.is_numeric_dtype(values[col])]
+        if text:
+            try:
+                values = values.assign(**{col: pd.to_numeric(values[col]) for col in text})
+            except (TypeError, ValueError):
+                raise ValueError(f"non-numeric feature columns {text}, pass ID columns as ids=[...] "
+                                 f"or leave them out with exclude=[...]") from None
+        return values.to_numpy(dtype=np.float32)
+
+    @staticmethod
+    def _trim(path, rows):
+        """ Rewrites an .npy file with only its first rows """
+        full = np.load(path, mmap_mode="r")
+        if len(full) == rows:
+            return
+        trimmed = np.lib.format.open_memmap(f"{path}.trim", mode="w+", dtype=full.dtype, shape=(rows,) + full.shape[1:])
+        trimmed[:] = full[:rows]
+        trimmed.flush()
+        del full, trimmed
+        os.replace(f"{path}.trim", path)
+
+    @staticmethod
+    def _int_target(path, block=1_000_000):
+        """ Rewrites y.npy (written as float64) as int64 if every label is a whole number """
+        y = np.load(path, mmap_mode="r")
+        for start in range(0, len(y), block):
+            part = y[start:start + block]
+            if not np.isfinite(part).all() or (part % 1 != 0).any():
+                return
+        labels = np.lib.format.open_memmap(f"{path}.int", mode="w+", dtype=np.int64, shape=y.shape)
+        for start in range(0, len(y), block):
+            labels[start:start + block] = y[start:start + block]
+        labels.flush()
+        del y, labels
+        os.replace(f"{path}.int", path)
+
+    def _write(self, name, version, columns, target, max_rows, chunks, source, ids=()):
+        path = self._dir(name, version)
+        # a private directory per build, concurrent builds of the same version (e.g.
+        # two sessions opening a page) do not delete each other's files
+        os.makedirs(os.path.join(self.root, ".tmp"), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f"{name}-{version}-", dir=os.path.join(self.root, ".tmp"))
+        try:
+            X = np.lib.format.open_memmap(os.path.join(tmp, "X.npy"), mode="w+", dtype=np.float32,
+                                          shape=(max_rows, len(columns)))
+            codes = {col: np.lib.format.open_memmap(os.path.join(tmp, f"{col}.ids.npy"), mode="w+",
+                                                    dtype=np.int64, shape=(max_rows,)) for col in ids}
+            labels = {col: {} for col in ids}
+            # float64 until every chunk is seen, a later chunk may have NaN or fractional labels
+            y = None if target is None else np.lib.format.open_memmap(
+                os.path.join(tmp, "y.npy"), mode="w+", dtype=np.float64, shape=(max_rows,))
+            start = 0
+            for chunk in chunks:
+                stop = start + len(chunk)
+                X[start:stop] = self._numeric(chunk, columns)
+                for col in ids:
+                    # codes in the order of first appearance, the same over all chunks
+                    chunk_codes, uniques = pd.factorize(chunk[col])
+                    mapping = np.array([labels[col].setdefault(label, len(labels[col])) for label in uniques] + [-1])
+                    codes[col][start:stop] = mapping[chunk_codes]
+                if y is not None:
+                    try:
+                        y[start:stop] = chunk[target].to_numpy(dtype=np.float64)
+                    except (TypeError, ValueError):
+                        raise ValueError(f"non-numeric target column {target!r}") from None
+                start = stop
+            del X, y, codes
+            for file in os.listdir(tmp):
+                self._trim(os.path.join(tmp, file), start)
+            if target is not None:
+                self._int_target(os.path.join(tmp, "y.npy"))
+
+            meta = {"name": name, "version": version, "columns": columns, "target": target,
+                    "rows": start, "created": time.time(), "source": source,
+                    "ids": {col: [label.item() if hasattr(label, "item") else label for label in labels[col]]
+                            for col in ids}}
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump(meta, f, indent=1)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.replace(tmp, path)
+            except OSError:
+                # the version exists (put with the same version, or a concurrent build
+                # finished first): move it aside, readers keep their open memmaps
+                old = tempfile.mkdtemp(prefix=f"{name}-{version}-old-", dir=os.path.join(self.root, ".tmp"))
+                os.replace(path, os.path.join(old, "data"))
+                os.replace(tmp, path)
+                shutil.rmtree(old, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return version
+
+    def get(self, name, version=None):
+        """ returns: (X, y, meta) with X and y memory-mapped read only (y is None without target) """
+        version = version or self.latest(name)
+        path = self._dir(name, version)
+        meta = self.meta(name, version)
+        X = np.load(os.path.join(path, "X.npy"), mmap_mode="r")
+        y_path = os.path.join(path, "y.npy")
+        y = np.load(y_path, mmap_mode="r") if os.path.exists(y_path) else None
+        return X[:meta["rows"]], (y[:meta["rows"]] if y is not None else None), meta
+
+    def ids(self, name, column, version=None):
+        """ returns: (codes, labels) of an ID column, codes memory-mapped (-1 for missing)
+        and labels[code] the original value
+        """
+        version = version or self.latest(name)
+        meta = self.meta(name, version)
+        codes = np.load(os.path.join(self._dir(name, version), f"{column}.ids.npy"), mmap_mode="r")
+        return codes, meta["ids"][column]
+
+    def column(self, name, column, version=None):
+        """ One feature column as a (strided) view of the memory-mapped matrix """
+        X, _, meta = self.get(name, version)
+        return X[:, meta["columns"].index(column)]
+
+    def frame(self, name, version=None, start=0, stop=None):
+        """ Rows start:stop as a DataFrame in the stored column order, backed by the memmap """
+        X, _, meta = self.get(name, version)
+        return pd.DataFrame(X[start:stop], columns=meta["columns"], copy=False)
+
+    def iter_frames(self, name, chunksize=50_000, version=None, ids=()):
+        """ DataFrames of chunksize rows, with the ID columns ids decoded to their
+        original values (None where missing) after the features
+        """
+        X, _, meta = self.get(name, version)
+        decoded = {}
+        for col in ids:
+            if col not in meta["ids"]:
+                raise KeyError(f"{name!r} has no ID column {col!r}, stored: {list(meta['ids'])}")
+            codes, labels = self.ids(name, col, meta["version"])
+            # code -1 (missing) picks the trailing None
+            decoded[col] = (codes, np.array(labels + [None], dtype=object))
+        for start in range(0, meta["rows"], chunksize):
+            frame = pd.DataFrame(X[start:start + chunksize], columns=meta["columns"], copy=False)
+            for col, (codes, labels) in decoded.items():
+                frame[col] = labels[codes[start:start + chunksize]]
+            yield frame
+
+
+feature_store = FeatureStore()
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+# sepsis_group codes of the neonatal registry that count as sepsis
+SEPSIS_BINARY = {1: 1, 4: 1, 5: 1}
+
+LABEL_MAPPINGS = {
+    "binary": SEPSIS_BINARY,
+    # every group code is its own class
+    "multiclass": None,
+}
+
+
+def map_to_binary(value):
+    """ Row-wise reference version of map_labels(..., SEPSIS_BINARY) """
+    if value == 1 or value in [4, 5]:
+        return 1
+    else:
+        return 0
+
+
+def map_labels(values, mapping=SEPSIS_BINARY, default=0):
+    """ inputs:
+            values: Series (or array) of group codes, numbers or numeric strings
+            mapping: dict code -> class, a name from LABEL_MAPPINGS, or None to keep
+                the codes as classes
+            default: class of every code missing from the mapping (also NaN)
+
+       outputs:
+           Series of classes with the index of values
+
+    - Looks all codes up at once with a sorted lookup table instead of calling a
+      python function per row
+    """
+    if isinstance(mapping, str):
+        mapping = LABEL_MAPPINGS[mapping]
+    values = pd.Series(values)
+    codes = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+    if mapping is None:
+        return pd.Series(codes, index=values.index)
+    if not mapping:
+        return pd.Series(default, index=values.index)
+
+    keys = np.array(list(mapping.keys()), dtype=float)
+    classes = np.array(list(mapping.values()))
+    order = np.argsort(keys)
+    keys, classes = keys[order], classes[order]
+
+    position = np.searchsorted(keys, codes).clip(0, len(keys) - 1)
+    found = keys[position] == codes
+    labels = np.where(found, classes[position], default)
+    return pd.Series(labels, index=values.index)
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sepsense import cleaning
+from sepsense.cleaning import run_spec, target_spec
+
+SPEC = target_spec(["a", "b"], "g", label_mapping="binary")
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return tmp_path / "cache"
+
+
+def test_chunks_write_columns_the_same_way(tmp_path, cache_dir):
+    source = tmp_path / "in.csv"
+    # "NI" only in the first chunk, a is read as text there without na_values
+    pd.DataFrame({"a": ["NI"] + list(range(1, 10)), "b": np.arange(10), "g": [1, 2, 3, 4, 5] * 2}).to_csv(source, index=False)
+    run_spec(SPEC, source, tmp_path / "out.csv", chunksize=3, cache_dir=cache_dir)
+    lines = (tmp_path / "out.csv").read_text().splitlines()
+    assert lines[0] == "a,b,target"
+    assert lines[1:3] == ["1.0,1.0,0", "2.0,2.0,0"]
+    assert lines[-1] == "9.0,9.0,1"
+
+
+@pytest.mark.parametrize("content", ["", "a,b,g\n"])
+def test_empty_input_writes_the_header(tmp_path, cache_dir, content):
+    source = tmp_path / "in.csv"
+    source.write_text(content)
+    stats = run_spec(SPEC, source, tmp_path / "out.csv", cache_dir=cache_dir)
+    assert stats["rows_out"] == 0
+    assert (tmp_path / "out.csv").read_text() == "a,b,target\n"
+
+
+def test_failed_run_keeps_the_old_output(tmp_path, cache_dir):
+    output = tmp_path / "out.csv"
+    output.write_text("a,b,target\n1.0,1.0,0\n")
+    source = tmp_path / "in.csv"
+    source.write_text("a,b,g\n" + "1,2,1\n" * 5 + '1,2,"unclosed\n')
+    with pytest.raises(pd.errors.ParserError):
+        run_spec(SPEC, source, output, chunksize=2, cache_dir=cache_dir)
+    assert output.read_text() == "a,b,target\n1.0,1.0,0\n"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cache", "in.csv", "out.csv"]
+    assert not [p for p in cache_dir.iterdir() if p.suffix in (".csv", ".tmp")]
+
+
+@pytest.fixture
+def registry_csv(tmp_path):
+    source = tmp_path / "in.csv"
+    pd.DataFrame({"a": range(100), "b": range(100), "g": [1, 2] * 50}).to_csv(source, index=False)
+    return source
+
+
+def test_unchanged_file_is_not_hashed_again(tmp_path, cache_dir, registry_csv, monkeypatch):
+    hashed = []
+    input_hash = cleaning._input_hash
+    monkeypatch.setattr(cleaning, "_input_hash", lambda source: hashed.append(source) or input_hash(source))
+    assert not run_spec(SPEC, registry_csv, tmp_path / "out.csv", cache_dir=cache_dir)["cached"]
+    assert run_spec(SPEC, registry_csv, tmp_path / "out.csv", cache_dir=cache_dir)["cached"]
+    assert len(hashed) == 1
+
+    registry_csv.write_text("a,b,g\n1,2,1\n")
+    stats = run_spec(SPEC, registry_csv, tmp_path / "out.csv", cache_dir=cache_dir)
+    assert not stats["cached"] and stats["rows_out"] == 1
+    assert len(hashed) == 2
+
+
+def test_new_cleaning_version_is_a_cache_miss(tmp_path, cache_dir, registry_csv, monkeypatch):
+    run_spec(SPEC, registry_csv, tmp_path / "out.csv", cache_dir=cache_dir)
+    monkeypatch.setattr(cleaning, "CLEANING_VERSION", cleaning.CLEANING_VERSION + 1)
+    assert not run_spec(SPEC, registry_csv, tmp_path / "out.csv", cache_dir=cache_dir)["cached"]
+
+
+def test_cache_keeps_the_most_recently_used_results(tmp_path, cache_dir, registry_csv):
+    # outputs of the same size
+    specs = [target_spec(["a", "b"], "g", label_mapping=mapping) for mapping in ({1: 1}, {2: 1}, {1: 1, 2: 1}, {})]
+    for spec in specs[:3]:
+        run_spec(spec, registry_csv, tmp_path / "out.csv", cache_dir=cache_dir)
+    size = max(p.stat().st_size for p in cache_dir.glob("*.csv"))
+    # use the first again, then add one more with room for two results
+    run_spec(specs[0], registry_csv, tmp_path / "out.csv", cache_dir=cache_dir)
+    run_spec(specs[3], registry_csv, tmp_path / "out.csv", cache_dir=cache_dir, cache_max_mb=2.5 * size / 1024 ** 2)
+    assert len(list(cache_dir.glob("*.csv"))) == 2
+    assert run_spec(specs[0], registry_csv, tmp_path / "out.csv", cache_dir=cache_dir)["cached"]
+    assert not run_spec(specs[1], registry_csv, tmp_path / "out.csv", cache_dir=cache_dir)["cached"]
+
+
+def test_output_is_a_link_to_the_cached_result(tmp_path, cache_dir, registry_csv):
+    output = tmp_path / "out.csv"
+    run_spec(SPEC, registry_csv, output, cache_dir=cache_dir)
+    (cached,) = cache_dir.glob("*.csv")
+    assert os.path.samefile(cached, output)
+
+    # an output rewritten in place changes the cached result too, it is cleaned again
+    expected = output.read_text()
+    output.write_text("a,b,target\n")
+    assert not run_spec(SPEC, registry_csv, output, cache_dir=cache_dir)["cached"]
+    assert output.read_text() == expected
+
+
+def test_result_larger_than_the_cache_is_not_cached(tmp_path, cache_dir, registry_csv):
+    output = tmp_path / "out.csv"
+    stats = run_spec(SPEC, registry_csv, output, cache_dir=cache_dir, cache_max_mb=100 / 1024 ** 2)
+    assert stats["rows_out"] == 100 and output.stat().st_size > 100
+    assert not list(cache_dir.glob("*.csv")) and not list(cache_dir.glob("*.tmp"))
+    assert not run_spec(SPEC, registry_csv, output, cache_dir=cache_dir, cache_max_mb=100 / 1024 ** 2)["cached"]
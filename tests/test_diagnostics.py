@@ -0,0 +1,57 @@
+import json
+import threading
+import tracemalloc
+
+from apps import diagnostics
+from apps.diagnostics import page_run, stage
+
+
+def test_overlapping_traced_runs_share_tracemalloc(monkeypatch):
+    monkeypatch.setattr(diagnostics, "LOG_PATH", "")
+    inside, release = threading.Event(), threading.Event()
+    runs = {}
+
+    def slow_page():
+        with page_run("slow", trace_memory=True) as run:
+            inside.set()
+            release.wait(5)
+        runs["slow"] = run
+
+    thread = threading.Thread(target=slow_page)
+    thread.start()
+    inside.wait(5)
+    with page_run("fast", trace_memory=True) as fast:
+        data = [0] * 100_000
+    # the first run must not lose tracing when the second one ends
+    assert tracemalloc.is_tracing()
+    release.set()
+    thread.join()
+
+    assert fast["record"]["python_peak_mb"] is None
+    assert runs["slow"]["record"]["python_peak_mb"] is None
+    assert not tracemalloc.is_tracing()
+
+    with page_run("alone", trace_memory=True) as alone:
+        data = [0] * 100_000
+    assert alone["record"]["python_peak_mb"] > 0.5
+    del data
+
+
+def test_log_is_batched_and_rotated(tmp_path, monkeypatch):
+    log = tmp_path / "diagnostics.jsonl"
+    monkeypatch.setattr(diagnostics, "LOG_PATH", str(log))
+    monkeypatch.setattr(diagnostics, "LOG_MAX_MB", 0.001)
+    monkeypatch.setattr(diagnostics, "FLUSH_RECORDS", 10)
+    monkeypatch.setattr(diagnostics, "FLUSH_SECONDS", 3600)
+
+    for _ in range(9):
+        with stage("poll"):
+            pass
+    assert not log.exists()
+    for _ in range(31):
+        with stage("poll"):
+            pass
+    diagnostics.flush()
+    assert (tmp_path / "diagnostics.jsonl.1").exists()
+    lines = log.read_text().splitlines() + (tmp_path / "diagnostics.jsonl.1").read_text().splitlines()
+    assert len(lines) < 40 and all(json.loads(line)["stage"] == "poll" for line in lines)
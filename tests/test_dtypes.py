@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import SMOTE
+
+from sepsense.dtypes import optimize_dtypes
+
+
+def test_only_labels_become_integers():
+    df = pd.DataFrame({
+        "ecmo": [0, 1, 1, 0],
+        "onset_age_in_days": [3, 40, 89, 120],
+        "weight": [2.5, 3.1, np.nan, 1.9],
+        "sepsis_group": [1, 4, 6, 2],
+        "sepsis_binary": [0, 1, 1, 0],
+        "record_id": [1, 2, 3, 10 ** 9],
+    })
+    compact, _ = optimize_dtypes(df)
+    assert compact["sepsis_group"].dtype == np.int8
+    assert compact["sepsis_binary"].dtype == np.int8
+    assert compact["ecmo"].dtype == np.float32
+    assert compact["onset_age_in_days"].dtype == np.float32
+    assert compact["weight"].dtype == np.float32
+    assert compact["record_id"].dtype == np.int64
+    # no wrap-around of small integer types in later arithmetic
+    assert (compact["onset_age_in_days"] * 1000).max() == 120000
+
+
+def test_smote_keeps_interpolated_flags():
+    rng = np.random.default_rng(0)
+    n_major, n_minor = 200, 20
+    df = pd.DataFrame({
+        # 40% of the minority class has the flag
+        "ecmo": np.r_[rng.integers(0, 2, n_major), np.tile([1, 1, 0, 0, 0], n_minor // 5)],
+        "weight": rng.normal(3, 0.5, n_major + n_minor),
+        "sepsis_binary": np.r_[np.zeros(n_major, dtype=int), np.ones(n_minor, dtype=int)],
+    })
+    compact, _ = optimize_dtypes(df)
+    X, y = compact.drop(columns="sepsis_binary"), compact["sepsis_binary"]
+    X_res, y_res = SMOTE(random_state=42).fit_resample(X, y)
+    synthetic = X_res["ecmo"].to_numpy()[len(X):]
+    # int8 flags were floored to 0 for every interpolated sample
+    assert (synthetic % 1 != 0).any()
+    assert abs(synthetic.mean() - 0.4) < 0.15
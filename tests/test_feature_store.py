@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sepsense.feature_store import FeatureStore
+
+
+@pytest.fixture
+def physionet_csv(tmp_path):
+    # like convert_psv_to_csv: Patient_ID is the file name
+    df = pd.DataFrame({
+        "Patient_ID": ["p000001"] * 3 + ["p000002"] * 2 + ["p000010"] * 4,
+        "ICULOS": [1, 2, 3, 1, 2, 1, 2, 3, 4],
+        "HR": [80, np.nan, 82, 90, 91, 70, 71, np.nan, 73],
+        "SepsisLabel": [0, 0, 1, 0, 0, 0, 0, 1, 1],
+    })
+    path = tmp_path / "physionet.csv"
+    df.to_csv(path, index=False)
+    return path, df
+
+
+def test_round_trip_with_string_ids(tmp_path, physionet_csv):
+    path, df = physionet_csv
+    store = FeatureStore(tmp_path / "store")
+    version = store.build_from_csv("physionet", path, target="SepsisLabel",
+                                   columns=["HR", "ICULOS", "Patient_ID"], ids=["Patient_ID"], chunksize=2)
+    X, y, meta = store.get("physionet", version)
+    assert meta["columns"] == ["HR", "ICULOS"]
+    np.testing.assert_array_equal(X, df[["HR", "ICULOS"]].to_numpy(dtype=np.float32))
+    np.testing.assert_array_equal(y, df["SepsisLabel"])
+
+    codes, labels = store.ids("physionet", "Patient_ID", version)
+    # codes are consistent over the chunks, three patients
+    assert [labels[code] for code in codes] == df["Patient_ID"].tolist()
+    assert len(set(codes.tolist())) == 3
+    # the same file and columns give the same version without a rebuild
+    assert store.build_from_csv("physionet", path, target="SepsisLabel",
+                                columns=["HR", "ICULOS", "Patient_ID"], ids=["Patient_ID"]) == version
+
+
+def test_text_feature_column_raises(tmp_path, physionet_csv):
+    path, _ = physionet_csv
+    store = FeatureStore(tmp_path / "store")
+    with pytest.raises(ValueError, match="Patient_ID"):
+        store.build_from_csv("physionet", path, target="SepsisLabel")
+    assert store.versions("physionet") == []
+
+
+def test_rows_are_counted_from_the_parsed_chunks(tmp_path):
+    path = tmp_path / "notes.csv"
+    path.write_text('a,note,target\n1,"two\nlines",0\n\n2,plain,1\n\n')
+    store = FeatureStore(tmp_path / "store")
+    version = store.build_from_csv("notes", path, target="target", exclude=["note"])
+    X, y, meta = store.get("notes", version)
+    assert meta["rows"] == 2
+    assert np.load(tmp_path / "store" / "notes" / version / "X.npy").shape == (2, 1)
+    np.testing.assert_array_equal(y, [0, 1])
+
+
+def test_concurrent_builds_of_the_same_version(tmp_path, physionet_csv):
+    path, df = physionet_csv
+    store = FeatureStore(tmp_path / "store")
+
+    def build(_):
+        return store.build_from_csv("physionet", path, target="SepsisLabel", ids=["Patient_ID"], chunksize=1)
+
+    with ThreadPoolExecutor(4) as pool:
+        versions = set(pool.map(build, range(8)))
+    assert len(versions) == 1
+    X, _, _ = store.get("physionet", versions.pop())
+    np.testing.assert_array_equal(X[:, 0], df["ICULOS"])
+
+
+def test_target_dtype_is_taken_from_every_chunk(tmp_path):
+    path = tmp_path / "labels.csv"
+    pd.DataFrame({"a": range(6), "target": [0, 1, 0, 1, np.nan, 0.5]}).to_csv(path, index=False)
+    store = FeatureStore(tmp_path / "store")
+    # the first chunks are whole numbers, the last one has NaN and a fraction
+    _, y, _ = store.get("labels", store.build_from_csv("labels", path, target="target", chunksize=2))
+    assert y.dtype == np.float64
+    np.testing.assert_array_equal(y, [0, 1, 0, 1, np.nan, 0.5])
+
+    path.write_text("a,target\n" + "".join(f"{i},{i % 3}\n" for i in range(6)))
+    _, y, _ = store.get("labels", store.build_from_csv("labels", path, target="target", chunksize=2))
+    assert y.dtype == np.int64
+    np.testing.assert_array_equal(y, [0, 1, 2, 0, 1, 2])
+
+
+def test_frames_with_decoded_ids(tmp_path, physionet_csv):
+    path, df = physionet_csv
+    store = FeatureStore(tmp_path / "store")
+    store.build_from_csv("physionet", path, target="SepsisLabel", ids=["Patient_ID"], chunksize=4)
+    frames = list(store.iter_frames("physionet", chunksize=4, ids=["Patient_ID"]))
+    assert [len(frame) for frame in frames] == [4, 4, 1]
+    assert pd.concat(frames)["Patient_ID"].tolist() == df["Patient_ID"].tolist()
+    with pytest.raises(KeyError, match="ICULOS"):
+        next(store.iter_frames("physionet", ids=["ICULOS"]))
@@ -0,0 +1,24 @@
+import time
+
+from apps.jobs import JobQueue
+
+
+def wait(queue, jobs):
+    while not all(job.done for job in jobs):
+        time.sleep(0.01)
+
+
+def test_finished_jobs_are_pruned():
+    queue = JobQueue(max_workers=1, ttl=3600, max_finished=2)
+    jobs = [queue.submit(f"job {i}", lambda job, i=i: i) for i in range(4)]
+    wait(queue, jobs)
+    # only the two most recently finished jobs are kept
+    assert [job.id for job in queue.jobs()] == [jobs[2].id, jobs[3].id]
+    assert queue.get(jobs[0].id) is None
+
+    queue.ttl = 0
+    running = queue.submit("slow", lambda job: time.sleep(0.2))
+    time.sleep(0.05)
+    # a running job is never pruned, the finished ones are past the ttl
+    assert queue.jobs() == [running]
+    wait(queue, [running])
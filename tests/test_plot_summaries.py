@@ -0,0 +1,35 @@
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+from apps.plot_summaries import _binned_kde, draw_violin, summarize
+
+
+def test_kde_of_small_binary_class_matches_grid():
+    values = np.array([0, 1] * 10 + [1] * 5, dtype=float)
+    kde = _binned_kde(values, points=128)
+    # the kernel is longer than the grid here
+    assert len(kde["grid"]) == len(kde["density"]) == 128
+    # still a density over the grid
+    step = kde["grid"][1] - kde["grid"][0]
+    assert abs(kde["density"].sum() * step - 1) < 0.05
+
+
+def test_kde_matches_same_mode_for_narrow_kernels():
+    values = np.random.default_rng(0).normal(size=5000)
+    kde = _binned_kde(values, points=128)
+    assert len(kde["density"]) == 128
+    assert kde["density"].argmax() in range(54, 74)
+
+
+def test_violin_of_small_binary_class():
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.integers(0, 2, 40), rng.normal(size=40)]).astype(np.float32)
+    y = np.array([0] * 25 + [1] * 15)
+    summary = summarize(X, y, ["flag", "value"])
+    fig, ax = plt.subplots()
+    draw_violin(ax, summary, "flag")
+    draw_violin(ax, summary, "value")
+    plt.close(fig)
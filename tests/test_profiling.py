@@ -0,0 +1,24 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from apps.profiling import class_balance, profile_file
+
+
+def test_class_balance_of_any_column_from_one_pass():
+    df = pd.DataFrame({
+        "weight": np.arange(500) * 1.5,
+        "group": [0, 1, 2, np.nan, 1] * 100,
+        "sex": ["f", "m"] * 250,
+    })
+    source = io.StringIO(df.to_csv(index=False))
+    profile = profile_file(source, target=None, chunksize=77)
+    assert class_balance(profile, "group") == {"0.0": 100, "1.0": 200, "2.0": 100, "None": 100}
+    assert class_balance(profile, "sex") == {"f": 250, "m": 250}
+    # too many distinct values for a target
+    assert class_balance(profile, "weight") is None
+
+    source.seek(0)
+    targeted = profile_file(source, target="group", chunksize=77)
+    assert class_balance(profile, "group") == targeted["classes"]
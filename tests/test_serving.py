@@ -0,0 +1,86 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from apps.serving import MicroBatcher
+from serve import make_handler
+
+FEATURES = ["temp_celsius", "birth_weight_kg", "stat_abx"]
+
+
+@pytest.fixture
+def model():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, len(FEATURES)))
+    return LogisticRegression().fit(X, (X[:, 0] > 0).astype(int))
+
+
+@pytest.fixture
+def batcher(model):
+    # a long window, so concurrent requests end up in the same batch
+    return MicroBatcher(model, FEATURES, max_batch_size=64, max_wait_ms=200, sla_ms=2000)
+
+
+def test_malformed_request_does_not_fail_the_batch(model, batcher):
+    good = [[0.5, 2.0, 1.0], {"temp_celsius": -1.0, "birth_weight_kg": 3.0, "stat_abx": 0}]
+    bad = [[0.5, 2.0]]
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(batcher.predict, good) for _ in range(3)] + [pool.submit(batcher.predict, bad)]
+    expected = model.predict_proba(np.array([[0.5, 2.0, 1.0], [-1.0, 3.0, 0.0]]))[:, 1]
+    for future in futures[:3]:
+        np.testing.assert_allclose(future.result(), expected)
+    with pytest.raises(ValueError, match="expected 3 values"):
+        futures[3].result()
+    assert batcher.stats()["mean_batch_size"] > 2
+
+
+@pytest.mark.parametrize("instance, message", [
+    ({"temp_celsius": 37.0, "birth_weight_kg": 3.0}, "missing features"),
+    ({"temp_celsius": 37.0, "birth_weight_kg": 3.0, "stat_abx": 0, "ecmo": 1}, "unknown features"),
+    ([37.0, "heavy", 0], "must be numbers"),
+    ("37.0", "expected 3 values"),
+])
+def test_rows_rejects_malformed_instances(batcher, instance, message):
+    with pytest.raises(ValueError, match=message):
+        batcher.rows([instance])
+
+
+def test_model_with_feature_names_gets_a_frame(batcher):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(100, 3)), columns=FEATURES)
+    batcher.model = LogisticRegression().fit(X, (X["stat_abx"] > 0).astype(int))
+    row = {"stat_abx": 2.0, "temp_celsius": 0.0, "birth_weight_kg": 0.0}
+    assert batcher.predict([row])[0] > 0.5
+
+
+def test_http_malformed_request_gets_400_alone(batcher):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(batcher))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/predict"
+
+    def post(instances):
+        request = urllib.request.Request(url, json.dumps({"instances": instances}).encode(),
+                                         {"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as error:
+            return error.code, json.load(error)
+
+    try:
+        with ThreadPoolExecutor(2) as pool:
+            good = pool.submit(post, [[0.5, 2.0, 1.0]])
+            bad = pool.submit(post, [[0.5, 2.0, 1.0, 4.0]])
+        assert good.result()[0] == 200
+        assert len(good.result()[1]["probabilities"]) == 1
+        assert bad.result()[0] == 400
+    finally:
+        server.shutdown()
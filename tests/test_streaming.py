@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from streaming import StreamingScorer
+from timeseries_features import timeseries_features
+
+VITALS = ["HR", "O2Sat", "Temp", "Resp"]
+
+
+@pytest.fixture
+def hourly():
+    rng = np.random.default_rng(0)
+    hours = 30
+    df = pd.DataFrame({
+        "Patient_ID": np.repeat(np.arange(8), hours),
+        "ICULOS": np.tile(np.arange(1, hours + 1), 8),
+        "Age": np.repeat(rng.uniform(20, 80, 8), hours),
+        "Gender": np.repeat(rng.integers(0, 2, 8), hours),
+    })
+    for i, vital in enumerate(VITALS):
+        values = rng.normal(50 + 20 * i, 5, len(df))
+        values[rng.random(len(df)) < 0.3] = np.nan
+        df[vital] = values
+    return df
+
+
+def test_streaming_matches_batch_pipeline(hourly):
+    X = timeseries_features(hourly, VITALS, keep=["Age", "Gender"])
+    y = (np.nan_to_num(X["HR_locf"].to_numpy()) > 50).astype(int)
+    pipeline = Pipeline([("imputer", SimpleImputer(keep_empty_features=True)), ("model", LogisticRegression(max_iter=2000))])
+    pipeline.fit(X, y)
+    expected = pipeline.predict_proba(X)[:, 1]
+
+    # another order of the vitals, the columns are matched by name
+    scorer = StreamingScorer(pipeline, VITALS[::-1], keep=["Age", "Gender"])
+    streamed = [scorer.update(row["Patient_ID"], row) for row in hourly.to_dict("records")]
+    np.testing.assert_allclose(streamed, expected, rtol=1e-4)
+
+
+def test_model_without_column_names_is_rejected(hourly):
+    X = timeseries_features(hourly, VITALS, keep=["Age", "Gender"]).fillna(0).to_numpy()
+    model = LogisticRegression(max_iter=2000).fit(X, np.arange(len(X)) % 2)
+    with pytest.raises(ValueError, match="keine Spaltennamen"):
+        StreamingScorer(model, VITALS)